@@ -9,6 +9,22 @@ const openai = new OpenAI({
   apiKey: process.env.OPENAI_API_KEY,
 });
 
+// Transcrição: usa o whisper-service local (API compatível com a OpenAI) quando
+// WHISPER_SERVICE_URL estiver definido, ex.: http://localhost:8000/v1
+// Nunca enviar a OPENAI_API_KEY para o whisper-service: sem WHISPER_SERVICE_API_KEY
+// vai um valor fixo (o SDK exige uma chave não vazia). A cota de áudio é cobrada
+// da clínica em X-Clinic-Id (aceito quando o backend roda na mesma máquina) ou
+// da clínica cadastrada para a chave em API_KEYS do serviço
+const transcriptionClient = process.env.WHISPER_SERVICE_URL
+  ? new OpenAI({
+      apiKey: process.env.WHISPER_SERVICE_API_KEY || 'whisper-service',
+      baseURL: process.env.WHISPER_SERVICE_URL,
+      defaultHeaders: {
+        'X-Clinic-Id': process.env.WHISPER_SERVICE_CLINIC_ID || 'cinthiamed',
+      },
+    })
+  : openai;
+
 /**
  * Sistema de prompts especializados para medicina
  */
@@ -443,7 +459,7 @@ export async function transcribeAudio(audioBuffer) {
       // Criar stream de leitura do arquivo
       const audioStream = fs.createReadStream(tempFilePath);
 
-      const transcription = await openai.audio.transcriptions.create({
+      const transcription = await transcriptionClient.audio.transcriptions.create({
         file: audioStream,
         model: 'whisper-1',
         language: 'pt', // Português
@@ -3,15 +3,30 @@ CinthiaMed - Serviço de Transcrição de Voz
 Utiliza Faster Whisper para transcrição otimizada de áudio médico
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
-from faster_whisper import WhisperModel
-import tempfile
+from fastapi.responses import PlainTextResponse
+import asyncio
+import hashlib
+import hmac
+import math
 import os
 import logging
-from typing import Optional
+import time
+from typing import List, Optional
 import uvicorn
 
+from audio_cache import AudioCache, audio_id_for, vad_key
+from diagnostics import (
+    FlightRecorder, ProfilerBusy, RequestTrace, SamplingProfiler,
+    current_trace, trace_params, traced_stage
+)
+from engines import SAMPLE_RATE, TranscriptionInfo, create_engine
+from guard import ABORT, SKIP, GuardConfig, HallucinationGuard
+import openai_compat
+from pipeline import OffsetSegments, SpeechAudio, StageBusy, TranscriptionPipeline
+from quota import AdmissionController, QuotaExceeded, parse_api_keys
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -43,19 +58,395 @@ app.add_middleware(
 MODEL_SIZE = os.getenv("WHISPER_MODEL_SIZE", "base")
 DEVICE = "cpu"  # Use "cuda" se tiver GPU na VPS
 COMPUTE_TYPE = "int8"  # Otimização para CPU
+# Backend de inferência: faster-whisper (padrão), onnx, openvino ou synthetic
+ENGINE_BACKEND = os.getenv("ENGINE_BACKEND", "faster-whisper")
 
-logger.info(f"Carregando modelo Whisper: {MODEL_SIZE}")
+logger.info(f"Carregando modelo Whisper: {MODEL_SIZE} (backend: {ENGINE_BACKEND})")
 try:
-    model = WhisperModel(
+    engine = create_engine(
+        ENGINE_BACKEND,
         MODEL_SIZE,
         device=DEVICE,
-        compute_type=COMPUTE_TYPE,
-        download_root="./models"  # Cache dos modelos
+        compute_type=COMPUTE_TYPE
     )
     logger.info("Modelo Whisper carregado com sucesso!")
 except Exception as e:
     logger.error(f"Erro ao carregar modelo: {e}")
-    model = None
+    engine = None
+
+# Modelos adicionais aceitos no /reprocess (ex.: "small,medium"), carregados sob demanda
+REPROCESS_MODELS = [m.strip() for m in os.getenv("REPROCESS_MODELS", "").split(",") if m.strip()]
+extra_engines = {}
+extra_engines_lock = asyncio.Lock()
+
+# Prompt médico otimizado para melhor reconhecimento
+MEDICAL_PROMPT = (
+    "Este é um atendimento médico. "
+    "Termos médicos comuns: paciente, sintomas, diagnóstico, prescrição, "
+    "hipertensão, diabetes, cefaleia, dispneia, febre, dor, exame, "
+    "hemograma, raio-x, ultrassom, tomografia, ressonância, "
+    "amoxicilina, paracetamol, ibuprofeno, losartana, metformina."
+)
+
+# VAD do /transcribe: mínimo de silêncio para separar segmentos
+TRANSCRIBE_VAD_PARAMETERS = dict(min_silence_duration_ms=500)
+
+# Guarda contra alucinação/loops de repetição durante a decodificação
+GUARD_CONFIG = GuardConfig.from_env()
+
+# Diagnóstico: profiler sob demanda e requisições mais lentas (endpoints /admin)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+profiler = SamplingProfiler()
+flight_recorder = FlightRecorder.from_env()
+TRACED_PATHS = ("/transcribe", "/transcribe-streaming", "/reprocess", "/v1/audio/transcriptions")
+
+# Controle de admissão por segundos de áudio (por clínica / API key)
+admission = AdmissionController.from_env()
+# API keys cadastradas (chave=clínica)
+API_KEYS = parse_api_keys(os.getenv("API_KEYS", ""))
+# Conexões cujos headers X-Clinic-Id / X-Real-IP são confiáveis
+TRUSTED_PROXIES = {ip.strip() for ip in os.getenv("TRUSTED_PROXIES", "127.0.0.1,::1").split(",") if ip.strip()}
+
+# Estágios decode -> VAD -> inferência com pools e filas próprios
+pipeline = TranscriptionPipeline.from_env()
+
+# PCM decodificado + mapas de fala por hash do áudio (re-transcrição barata)
+audio_cache = AudioCache.from_env()
+
+
+def get_tenant_id(request: Request) -> str:
+    """
+    Identifica o cliente cobrado pela requisição
+
+    Apenas informações verificáveis definem o cliente, para que ninguém ganhe
+    um balde novo trocando de header a cada requisição:
+    - X-Clinic-Id e X-Real-IP só valem quando a conexão vem de TRUSTED_PROXIES
+      (Nginx ou o backend na mesma máquina)
+    - X-API-Key ou `Authorization: Bearer` (usado pelo SDK da OpenAI) cadastrada
+      em API_KEYS cobra a clínica da chave
+    - chave desconhecida ou ausente: o IP do cliente (não dá um balde novo e
+      não divide o balde com outros clientes)
+    """
+    peer_ip = request.client.host if request.client else "unknown"
+    trusted = peer_ip in TRUSTED_PROXIES
+
+    clinic_id = request.headers.get("x-clinic-id", "").strip()
+    if trusted and clinic_id:
+        return clinic_id
+
+    api_key = request.headers.get("x-api-key")
+    authorization = request.headers.get("authorization", "")
+    if not api_key and authorization.lower().startswith("bearer "):
+        api_key = authorization[7:].strip()
+    if api_key:
+        clinic_id = API_KEYS.get(hashlib.sha256(api_key.encode()).hexdigest())
+        if clinic_id:
+            return clinic_id
+
+    client_ip = (request.headers.get("x-real-ip") if trusted else None) or peer_ip
+    return f"ip:{client_ip}"
+
+
+async def prepare_speech(
+    tenant: str,
+    vad_parameters: Optional[dict] = None,
+    content: Optional[bytes] = None,
+    audio_id: Optional[str] = None,
+    cache: bool = False
+):
+    """
+    Estágios 1 e 2: decodifica o upload, cobra a duração do cliente e aplica o VAD
+
+    A cobrança acontece logo após a decodificação, antes de gastar CPU com VAD.
+    Áudios já vistos (mesmo hash, mesmo cliente) saem do cache sem decodificar
+    nem rodar o VAD de novo. Sem `content` o áudio precisa estar no cache.
+    Só com `cache=True` (endpoints que devolvem o `audio_id`) um upload novo é
+    guardado, para não manter em memória áudio de consulta que não pode ser
+    reprocessado.
+
+    Returns:
+        (audio_id, SpeechAudio)
+    """
+    audio_id = audio_id or audio_id_for(content)
+    cached = audio_cache.get(tenant, audio_id)
+    cache_hit = cached is not None
+
+    if cached is not None:
+        audio_array = cached.audio
+    elif content is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Áudio não encontrado ou expirado: {audio_id} (envie o arquivo novamente)"
+        )
+    else:
+        try:
+            with traced_stage("decode"):
+                audio_array = await pipeline.decode(content)
+        except StageBusy as e:
+            raise stage_busy_error(e)
+        except Exception as e:
+            logger.error(f"Erro ao decodificar áudio: {e}")
+            raise HTTPException(status_code=400, detail=f"Não foi possível decodificar o áudio: {str(e)}")
+        if cache:
+            cached = audio_cache.put(tenant, audio_id, audio_array)
+
+    audio_duration = audio_array.shape[0] / SAMPLE_RATE
+    try:
+        admission.charge(tenant, audio_duration)
+    except QuotaExceeded as e:
+        raise quota_exceeded_error(tenant, e)
+
+    key = vad_key(vad_parameters)
+    chunks = cached.speech_chunks.get(key) if cached is not None else None
+    try:
+        with traced_stage("vad"):
+            speech = await pipeline.detect_speech(audio_array, vad_parameters, chunks)
+    except StageBusy as e:
+        admission.refund(tenant, audio_duration)
+        raise stage_busy_error(e)
+
+    if cached is not None:
+        cached.speech_chunks[key] = speech.chunks
+    trace_params(
+        audio_seconds=round(speech.duration, 2),
+        speech_seconds=round(speech.audio.shape[0] / SAMPLE_RATE, 2),
+        audio_cache_hit=cache_hit
+    )
+    return audio_id, speech
+
+
+async def run_inference(tenant: str, speech: SpeechAudio, fn):
+    """Estágio 3: aguarda o slot justo do cliente e executa `fn` no pool de inferência"""
+    if not speech.has_speech:
+        # Só silêncio: nada para o modelo, não ocupar o slot
+        return fn()
+
+    trace = current_trace.get()
+    wait_start = time.perf_counter()
+    async with admission.slot(tenant, speech.duration):
+        if trace is not None:
+            trace.add("inference_wait", time.perf_counter() - wait_start)
+        with traced_stage("inference"):
+            return await pipeline.infer(fn)
+
+
+async def get_engine(model_size: Optional[str] = None):
+    """Motor padrão ou, para /reprocess, um dos modelos de REPROCESS_MODELS"""
+    if not model_size or model_size == MODEL_SIZE:
+        return engine
+
+    if model_size not in REPROCESS_MODELS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Modelo não disponível: {model_size} (opções: {', '.join([MODEL_SIZE] + REPROCESS_MODELS)})"
+        )
+
+    async with extra_engines_lock:
+        if model_size not in extra_engines:
+            logger.info(f"Carregando modelo adicional: {model_size}")
+            loop = asyncio.get_running_loop()
+            extra_engines[model_size] = await loop.run_in_executor(
+                None,
+                lambda: create_engine(ENGINE_BACKEND, model_size, device=DEVICE, compute_type=COMPUTE_TYPE)
+            )
+    return extra_engines[model_size]
+
+
+async def transcribe_speech(
+    tenant: str,
+    speech: SpeechAudio,
+    transcription_engine,
+    language: Optional[str],
+    initial_prompt: Optional[str],
+    beam_size: int,
+    word_timestamps: bool = False,
+    temperature: Optional[float] = None,
+    detailed: bool = False
+):
+    """
+    Transcreve os trechos com fala e retorna (texto, segmentos, info, relatório da guarda)
+
+    Com `detailed` cada segmento inclui os campos do verbose_json da OpenAI
+    (id, seek, tokens, temperature, avg_logprob, compression_ratio,
+    no_speech_prob e words).
+    """
+
+    speech_seconds = speech.audio.shape[0] / SAMPLE_RATE
+
+    def skip_after(guard: HallucinationGuard, end: float) -> Optional[float]:
+        """Após um ABORT em `end` (tempo sem silêncio): onde retomar ou None para parar"""
+        resume_at = guard.resume_at(end)
+        if resume_at is None:
+            logger.warning(f"Guarda encerrou a decodificação em {speech.original_time(end):.1f}s")
+            guard.flag(speech.original_time(end), speech.duration, "resume_budget", ABORT)
+            return None
+
+        resume_at = min(resume_at, speech_seconds)
+        logger.warning(
+            f"Guarda pulou {speech.original_time(end):.1f}s-{speech.original_time(resume_at):.1f}s"
+        )
+        guard.flag(speech.original_time(end), speech.original_time(resume_at), "skipped_window", SKIP)
+        return resume_at
+
+    def run_transcription():
+        guard = HallucinationGuard(GUARD_CONFIG)
+        if not speech.has_speech:
+            return "", [], no_speech_info(language, speech), guard.report()
+
+        full_text = ""
+        segments_list = []
+        info = None
+        offset = 0.0
+
+        # Transcrever apenas os trechos com fala (VAD já aplicado no estágio 2).
+        # Num ABORT da guarda a decodificação pula o trecho ruim e recomeça
+        # adiante, dentro do limite de retomadas da guarda.
+        while offset < speech_seconds:
+            segments, window_info = transcription_engine.transcribe(
+                speech.audio[int(offset * SAMPLE_RATE):],
+                language=language or (info.language if info else None),
+                initial_prompt=initial_prompt,
+                beam_size=beam_size,
+                vad_filter=False,
+                word_timestamps=word_timestamps,
+                temperature=temperature
+            )
+            info = info or window_info
+            shifted = OffsetSegments(segments, offset)
+
+            # Extrair texto completo e segmentos (a inferência acontece ao iterar)
+            resume_at = None
+            for segment in speech.restore_timestamps(shifted):
+                action = guard.check(segment)
+                if action == ABORT:
+                    # Parar de consumir o gerador interrompe a inferência
+                    resume_at = skip_after(guard, shifted.last_end)
+                    break
+                if action == SKIP:
+                    continue
+
+                full_text += segment.text
+                segment_data = {
+                    "start": round(segment.start, 2),
+                    "end": round(segment.end, 2),
+                    "text": segment.text.strip()
+                }
+                if detailed:
+                    segment_data = {"id": len(segments_list), **segment_data, **detailed_segment(segment)}
+                segments_list.append(segment_data)
+
+            if resume_at is None:
+                break
+            offset = resume_at
+
+        return full_text, segments_list, info, guard.report()
+
+    trace_params(
+        backend=ENGINE_BACKEND,
+        model=transcription_engine.model_size,
+        language=language,
+        beam_size=beam_size,
+        temperature=temperature,
+        word_timestamps=word_timestamps,
+        # Prompt efetivamente usado: nenhum, o médico padrão ou um do cliente
+        prompt="none" if not initial_prompt else "medical" if initial_prompt == MEDICAL_PROMPT else "custom"
+    )
+    result = await run_inference(tenant, speech, run_transcription)
+    _, segments_list, _, guard_report = result
+    trace_params(
+        segments=len(segments_list),
+        guard_skipped=guard_report["skipped_segments"],
+        guard_aborted=guard_report["aborted"]
+    )
+    return result
+
+
+def detailed_segment(segment) -> dict:
+    """Campos extras de um segmento no formato verbose_json da OpenAI"""
+    words = getattr(segment, "words", None)
+    return {
+        "seek": getattr(segment, "seek", 0),
+        "tokens": list(getattr(segment, "tokens", None) or []),
+        "temperature": getattr(segment, "temperature", None) or 0.0,
+        "avg_logprob": getattr(segment, "avg_logprob", None),
+        "compression_ratio": getattr(segment, "compression_ratio", None),
+        "no_speech_prob": getattr(segment, "no_speech_prob", None),
+        "words": [
+            {"word": word.word.strip(), "start": round(word.start, 2), "end": round(word.end, 2)}
+            for word in words
+        ] if words else None
+    }
+
+
+def transcription_response(audio_id: str, speech: SpeechAudio, full_text: str, segments_list: list,
+                           info, guard_report: dict, model_size: str) -> dict:
+    return {
+        "success": True,
+        "text": full_text.strip(),
+        "segments": segments_list,
+        "metadata": {
+            "audio_id": audio_id,
+            "language": info.language,
+            "language_probability": round(info.language_probability, 3),
+            "duration": round(speech.duration, 2),
+            "model": model_size,
+            "backend": ENGINE_BACKEND,
+            "guard": guard_report
+        }
+    }
+
+
+def no_speech_info(language: Optional[str], speech: SpeechAudio) -> TranscriptionInfo:
+    return TranscriptionInfo(language=language or "unknown", language_probability=0.0, duration=speech.duration)
+
+
+def quota_exceeded_error(tenant: str, error: QuotaExceeded) -> HTTPException:
+    """Converte a recusa do controle de admissão em resposta 429"""
+    retry_after = max(1, math.ceil(error.retry_after)) if math.isfinite(error.retry_after) else 3600
+    logger.warning(f"Requisição recusada para {tenant}: {error} (retry em {retry_after}s)")
+    return HTTPException(
+        status_code=429,
+        detail=str(error),
+        headers={"Retry-After": str(retry_after)}
+    )
+
+
+def stage_busy_error(error: StageBusy) -> HTTPException:
+    """Fila de um estágio do pipeline cheia: resposta 503"""
+    logger.warning(str(error))
+    return HTTPException(
+        status_code=503,
+        detail=str(error),
+        headers={"Retry-After": str(max(1, math.ceil(error.retry_after)))}
+    )
+
+
+@app.middleware("http")
+async def record_slow_requests(request: Request, call_next):
+    """Mede os estágios das requisições de transcrição para o /admin/slow-requests"""
+    if request.method != "POST" or request.url.path not in TRACED_PATHS:
+        return await call_next(request)
+
+    trace = RequestTrace(request.url.path)
+    token = current_trace.set(trace)
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        current_trace.reset(token)
+        flight_recorder.record(trace.finish(status_code))
+
+
+def require_admin(request: Request):
+    """Endpoints /admin exigem o header X-Admin-Token igual a ADMIN_TOKEN"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Endpoints administrativos desativados (defina ADMIN_TOKEN)")
+
+    token = request.headers.get("x-admin-token", "")
+    if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Token administrativo inválido")
 
 
 @app.get("/")
@@ -65,31 +456,40 @@ async def root():
         "service": "CinthiaMed Voice Service",
         "status": "online",
         "model": MODEL_SIZE,
-        "model_loaded": model is not None
+        "backend": ENGINE_BACKEND,
+        "model_loaded": engine is not None
     }
 
 
 @app.get("/health")
 async def health_check():
     """Verificação de saúde do serviço"""
-    if model is None:
+    if engine is None:
         raise HTTPException(status_code=503, detail="Modelo Whisper não carregado")
 
     return {
         "status": "healthy",
         "model": MODEL_SIZE,
-        "device": DEVICE
+        "device": DEVICE,
+        "backend": ENGINE_BACKEND,
+        "admission": admission.snapshot(),
+        "pipeline": pipeline.snapshot(inference_queue={
+            "queued": admission.scheduler.waiting(),
+            "max_queue": admission.scheduler.max_queue
+        }),
+        "audio_cache": audio_cache.snapshot()
     }
 
 
 @app.post("/transcribe")
 async def transcribe_audio(
+    request: Request,
     audio: UploadFile = File(...),
     language: Optional[str] = Form("pt"),
     initial_prompt: Optional[str] = Form(None)
 ):
     """
-    Transcreve áudio em texto usando Faster Whisper
+    Transcreve áudio em texto usando o backend configurado (Faster Whisper por padrão)
 
     Args:
         audio: Arquivo de áudio (formatos suportados: mp3, wav, m4a, ogg, webm)
@@ -100,7 +500,7 @@ async def transcribe_audio(
         JSON com o texto transcrito e metadados
     """
 
-    if model is None:
+    if engine is None:
         raise HTTPException(
             status_code=503,
             detail="Serviço indisponível: modelo não carregado"
@@ -124,65 +524,33 @@ async def transcribe_audio(
             detail=f"Arquivo muito grande: {file_size_mb:.2f}MB (máximo: 25MB)"
         )
 
-    logger.info(f"Recebido áudio: {audio.filename} ({file_size_mb:.2f}MB)")
+    tenant = get_tenant_id(request)
+    logger.info(f"Recebido áudio: {audio.filename} ({file_size_mb:.2f}MB) de {tenant}")
+
+    # Decodificar e segmentar antes da inferência: a duração real do áudio é o custo cobrado
+    audio_id, speech = await prepare_speech(tenant, TRANSCRIBE_VAD_PARAMETERS, content=content, cache=True)
 
-    # Salvar temporariamente
-    temp_file = None
     try:
-        # Criar arquivo temporário
-        suffix = os.path.splitext(audio.filename)[1] if audio.filename else ".webm"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-
-        logger.info(f"Processando transcrição: {temp_file_path}")
-
-        # Prompt médico otimizado para melhor reconhecimento
-        medical_prompt = initial_prompt or (
-            "Este é um atendimento médico. "
-            "Termos médicos comuns: paciente, sintomas, diagnóstico, prescrição, "
-            "hipertensão, diabetes, cefaleia, dispneia, febre, dor, exame, "
-            "hemograma, raio-x, ultrassom, tomografia, ressonância, "
-            "amoxicilina, paracetamol, ibuprofeno, losartana, metformina."
+        logger.info(f"Processando transcrição: {speech.duration:.1f}s de áudio")
+        full_text, segments_list, info, guard_report = await transcribe_speech(
+            tenant,
+            speech,
+            engine,
+            language,
+            initial_prompt or MEDICAL_PROMPT,
+            beam_size=5  # Qualidade da transcrição (5 é um bom balanço)
         )
 
-        # Transcrever usando Faster Whisper
-        segments, info = model.transcribe(
-            temp_file_path,
-            language=language,
-            initial_prompt=medical_prompt,
-            beam_size=5,  # Qualidade da transcrição (5 é um bom balanço)
-            vad_filter=True,  # Filtro de detecção de atividade de voz
-            vad_parameters=dict(
-                min_silence_duration_ms=500  # Mínimo de silêncio para separar segmentos
-            )
+        logger.info(f"Transcrição concluída: {len(segments_list)} segmentos")
+        return transcription_response(
+            audio_id, speech, full_text, segments_list, info, guard_report, MODEL_SIZE
         )
 
-        # Extrair texto completo e segmentos
-        full_text = ""
-        segments_list = []
-
-        for segment in segments:
-            full_text += segment.text
-            segments_list.append({
-                "start": round(segment.start, 2),
-                "end": round(segment.end, 2),
-                "text": segment.text.strip()
-            })
-
-        logger.info(f"Transcrição concluída: {len(segments_list)} segmentos")
+    except QuotaExceeded as e:
+        raise quota_exceeded_error(tenant, e)
 
-        return {
-            "success": True,
-            "text": full_text.strip(),
-            "segments": segments_list,
-            "metadata": {
-                "language": info.language,
-                "language_probability": round(info.language_probability, 3),
-                "duration": round(info.duration, 2),
-                "model": MODEL_SIZE
-            }
-        }
+    except StageBusy as e:
+        raise stage_busy_error(e)
 
     except Exception as e:
         logger.error(f"Erro na transcrição: {str(e)}")
@@ -191,18 +559,78 @@ async def transcribe_audio(
             detail=f"Erro ao processar áudio: {str(e)}"
         )
 
-    finally:
-        # Limpar arquivo temporário
-        if temp_file and os.path.exists(temp_file_path):
-            try:
-                os.unlink(temp_file_path)
-                logger.info(f"Arquivo temporário removido: {temp_file_path}")
-            except Exception as e:
-                logger.warning(f"Erro ao remover arquivo temporário: {e}")
+
+@app.post("/reprocess")
+async def reprocess_audio(
+    request: Request,
+    audio_id: str = Form(...),
+    language: Optional[str] = Form("pt"),
+    initial_prompt: Optional[str] = Form(None),
+    model_size: Optional[str] = Form(None, alias="model"),
+    beam_size: int = Form(5)
+):
+    """
+    Re-transcreve um áudio já enviado, sem novo upload
+
+    Usa o PCM decodificado e o mapa de fala do VAD guardados no cache pelo
+    /transcribe; apenas o modelo roda de novo com os novos parâmetros.
+
+    Args:
+        audio_id: `metadata.audio_id` retornado pelo /transcribe
+        language: Código do idioma (padrão: 'pt')
+        initial_prompt: Prompt inicial (opcional, padrão: prompt médico)
+        model: Modelo alternativo listado em REPROCESS_MODELS (opcional)
+        beam_size: Tamanho do beam search (padrão: 5)
+
+    Returns:
+        JSON no mesmo formato do /transcribe
+    """
+
+    if engine is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Serviço indisponível: modelo não carregado"
+        )
+
+    if not 1 <= beam_size <= 10:
+        raise HTTPException(status_code=400, detail=f"beam_size inválido: {beam_size} (1 a 10)")
+
+    tenant = get_tenant_id(request)
+    transcription_engine = await get_engine(model_size)
+    audio_id, speech = await prepare_speech(tenant, TRANSCRIBE_VAD_PARAMETERS, audio_id=audio_id)
+
+    try:
+        logger.info(f"Reprocessando {audio_id[:12]}: {speech.duration:.1f}s de áudio")
+        full_text, segments_list, info, guard_report = await transcribe_speech(
+            tenant,
+            speech,
+            transcription_engine,
+            language,
+            initial_prompt or MEDICAL_PROMPT,
+            beam_size=beam_size
+        )
+
+        return transcription_response(
+            audio_id, speech, full_text, segments_list, info, guard_report, model_size or MODEL_SIZE
+        )
+
+    except QuotaExceeded as e:
+        raise quota_exceeded_error(tenant, e)
+
+    except StageBusy as e:
+        raise stage_busy_error(e)
+
+    except Exception as e:
+        logger.error(f"Erro no reprocessamento: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erro ao processar áudio: {str(e)}"
+        )
 
 
 @app.post("/transcribe-streaming")
 async def transcribe_streaming(
+    request: Request,
     audio: UploadFile = File(...),
     language: Optional[str] = Form("pt")
 ):
@@ -211,7 +639,7 @@ async def transcribe_streaming(
     Ideal para uso em tempo real onde os segmentos não são necessários
     """
 
-    if model is None:
+    if engine is None:
         raise HTTPException(
             status_code=503,
             detail="Serviço indisponível: modelo não carregado"
@@ -226,40 +654,161 @@ async def transcribe_streaming(
             detail=f"Arquivo muito grande: {file_size_mb:.2f}MB"
         )
 
-    temp_file = None
+    tenant = get_tenant_id(request)
+    _, speech = await prepare_speech(tenant, content=content)
+
     try:
-        suffix = os.path.splitext(audio.filename)[1] if audio.filename else ".webm"
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-
-        # Transcrição rápida sem segmentos
-        segments, info = model.transcribe(
-            temp_file_path,
-            language=language,
-            beam_size=3,  # Menor para velocidade
-            vad_filter=True
+        # Transcrição rápida: beam menor e apenas o texto final
+        text, _, info, _ = await transcribe_speech(
+            tenant,
+            speech,
+            engine,
+            language,
+            initial_prompt=None,
+            beam_size=3  # Menor para velocidade
         )
 
-        # Apenas concatenar o texto
-        text = "".join([segment.text for segment in segments]).strip()
-
         return {
             "success": True,
-            "text": text,
+            "text": text.strip(),
             "language": info.language
         }
 
+    except QuotaExceeded as e:
+        raise quota_exceeded_error(tenant, e)
+
+    except StageBusy as e:
+        raise stage_busy_error(e)
+
     except Exception as e:
         logger.error(f"Erro na transcrição: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-    finally:
-        if temp_file and os.path.exists(temp_file_path):
-            try:
-                os.unlink(temp_file_path)
-            except:
-                pass
+
+@app.post("/v1/audio/transcriptions")
+async def openai_transcriptions(
+    request: Request,
+    file: UploadFile = File(...),
+    model_name: str = Form("whisper-1", alias="model"),
+    language: Optional[str] = Form(None),
+    prompt: Optional[str] = Form(None),
+    response_format: str = Form("json"),
+    temperature: float = Form(0.0),
+    timestamp_granularities: Optional[List[str]] = Form(None, alias="timestamp_granularities[]")
+):
+    """
+    Transcrição compatível com a API da OpenAI (`audio.transcriptions.create`)
+
+    Permite apontar o `baseURL` do SDK da OpenAI para este serviço
+    (ex.: http://localhost:8000/v1) sem alterar o código do backend.
+    `model=whisper-1` usa o modelo padrão; outros nomes precisam estar em
+    REPROCESS_MODELS. Erros seguem o formato {"error": {...}} da OpenAI.
+    """
+    granularities = timestamp_granularities or []
+    trace_params(response_format=response_format)
+
+    try:
+        if engine is None:
+            raise HTTPException(status_code=503, detail="Serviço indisponível: modelo não carregado")
+
+        if response_format not in openai_compat.RESPONSE_FORMATS:
+            return openai_compat.error_response(
+                400,
+                f"response_format inválido: {response_format} "
+                f"(opções: {', '.join(openai_compat.RESPONSE_FORMATS)})",
+                param="response_format"
+            )
+
+        invalid = [g for g in granularities if g not in openai_compat.TIMESTAMP_GRANULARITIES]
+        if invalid:
+            return openai_compat.error_response(
+                400, f"timestamp_granularities inválido: {', '.join(invalid)}", param="timestamp_granularities"
+            )
+        if granularities and response_format != "verbose_json":
+            return openai_compat.error_response(
+                400, "timestamp_granularities exige response_format=verbose_json", param="timestamp_granularities"
+            )
+
+        model_size = None if model_name in openai_compat.DEFAULT_MODEL_ALIASES else model_name
+        transcription_engine = await get_engine(model_size)
+
+        content = await file.read()
+        file_size_mb = len(content) / (1024 * 1024)
+        if file_size_mb > 25:
+            return openai_compat.error_response(
+                413, f"Arquivo muito grande: {file_size_mb:.2f}MB (máximo: 25MB)", param="file"
+            )
+
+        tenant = get_tenant_id(request)
+        logger.info(f"Recebido áudio (API OpenAI): {file.filename} ({file_size_mb:.2f}MB) de {tenant}")
+
+        _, speech = await prepare_speech(tenant, TRANSCRIBE_VAD_PARAMETERS, content=content)
+        full_text, segments_list, info, _ = await transcribe_speech(
+            tenant,
+            speech,
+            transcription_engine,
+            language,
+            prompt or MEDICAL_PROMPT,
+            beam_size=5,
+            word_timestamps="word" in granularities,
+            temperature=temperature,
+            detailed=True
+        )
+
+    except QuotaExceeded as e:
+        error = quota_exceeded_error(tenant, e)
+        return openai_compat.error_response(error.status_code, error.detail, headers=error.headers)
+
+    except StageBusy as e:
+        error = stage_busy_error(e)
+        return openai_compat.error_response(error.status_code, error.detail, headers=error.headers)
+
+    except HTTPException as e:
+        return openai_compat.error_response(e.status_code, e.detail, headers=e.headers)
+
+    except Exception as e:
+        logger.error(f"Erro na transcrição: {str(e)}")
+        return openai_compat.error_response(500, f"Erro ao processar áudio: {str(e)}")
+
+    return openai_compat.render(
+        response_format,
+        full_text.strip(),
+        segments_list,
+        info.language,
+        speech.duration,
+        granularities
+    )
+
+
+@app.get("/admin/profile")
+async def admin_profile(request: Request, seconds: float = 10.0, interval_ms: float = 10.0):
+    """
+    Profiling por amostragem do processo durante `seconds` segundos (máx. 60)
+
+    Retorna stacks colapsadas ("thread;frame;...;frame contagem"), que podem
+    ser abertas no speedscope ou convertidas com flamegraph.pl.
+    """
+    require_admin(request)
+
+    loop = asyncio.get_running_loop()
+    try:
+        stacks = await loop.run_in_executor(None, profiler.run, seconds, interval_ms / 1000)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    return PlainTextResponse(SamplingProfiler.collapsed(stacks))
+
+
+@app.get("/admin/slow-requests")
+async def admin_slow_requests(request: Request):
+    """Requisições mais lentas recentes com o tempo por estágio (sem áudio nem texto)"""
+    require_admin(request)
+
+    return {
+        "capacity": flight_recorder.capacity,
+        "window_seconds": flight_recorder.window_seconds,
+        "requests": flight_recorder.slowest()
+    }
 
 
 if __name__ == "__main__":
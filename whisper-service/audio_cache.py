@@ -0,0 +1,126 @@
+"""
+CinthiaMed - Cache de áudio decodificado
+Guarda o PCM 16 kHz e os mapas de fala do VAD por hash do conteúdo, para
+que a re-transcrição com outro prompt, idioma ou modelo (POST /reprocess) não
+repita upload, decodificação, resample e VAD.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from engines import SAMPLE_RATE
+
+
+def audio_id_for(content: bytes) -> str:
+    """Identificador do áudio: hash SHA-256 do arquivo enviado"""
+    return hashlib.sha256(content).hexdigest()
+
+
+def vad_key(vad_parameters: Optional[dict]) -> str:
+    """Chave estável para um conjunto de parâmetros de VAD"""
+    return repr(sorted((vad_parameters or {}).items()))
+
+
+@dataclass
+class CachedAudio:
+    audio: np.ndarray
+    created_at: float
+    speech_chunks: Dict[str, List[dict]] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        return self.audio.shape[0] / SAMPLE_RATE
+
+    @property
+    def nbytes(self) -> int:
+        return self.audio.nbytes
+
+
+class AudioCache:
+    """
+    LRU limitado por bytes e com TTL
+
+    As entradas são isoladas por cliente: o mesmo `audio_id` enviado por
+    outra clínica não é visível para ela. O TTL limita por quanto tempo áudio
+    de consulta fica em memória.
+    """
+
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024, ttl_seconds: float = 900.0,
+                 enabled: bool = True, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.clock = clock
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[tuple, CachedAudio]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "AudioCache":
+        return cls(
+            max_bytes=int(float(os.getenv("AUDIO_CACHE_MAX_MB", 512)) * 1024 * 1024),
+            ttl_seconds=float(os.getenv("AUDIO_CACHE_TTL_SECONDS", 900)),
+            enabled=os.getenv("AUDIO_CACHE_ENABLED", "true").lower() == "true",
+        )
+
+    def get(self, tenant: str, audio_id: str) -> Optional[CachedAudio]:
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            self._expire(self.clock())
+            entry = self._entries.get((tenant, audio_id))
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end((tenant, audio_id))
+            self.hits += 1
+            return entry
+
+    def put(self, tenant: str, audio_id: str, audio: np.ndarray) -> Optional[CachedAudio]:
+        """Guarda o PCM decodificado (áudios maiores que o cache inteiro são ignorados)"""
+        if not self.enabled or audio.nbytes > self.max_bytes:
+            return None
+
+        entry = CachedAudio(audio=audio, created_at=self.clock())
+        with self._lock:
+            previous = self._entries.pop((tenant, audio_id), None)
+            if previous is not None:
+                self.total_bytes -= previous.nbytes
+                entry.speech_chunks = previous.speech_chunks
+
+            self._entries[(tenant, audio_id)] = entry
+            self.total_bytes += entry.nbytes
+            self._expire(entry.created_at)
+            while self.total_bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= evicted.nbytes
+
+        return entry
+
+    def _expire(self, now: float):
+        expired = [key for key, entry in self._entries.items() if now - entry.created_at > self.ttl_seconds]
+        for key in expired:
+            self.total_bytes -= self._entries.pop(key).nbytes
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "size_mb": round(self.total_bytes / (1024 * 1024), 1),
+                "max_mb": round(self.max_bytes / (1024 * 1024), 1),
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
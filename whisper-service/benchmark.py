@@ -0,0 +1,114 @@
+"""
+Benchmark dos backends de inferência do CinthiaMed Voice Service
+Mede o motor diretamente (sem HTTP) e imprime um resumo em JSON com os mesmos
+campos para qualquer backend, para comparar faster-whisper, onnx, openvino e
+synthetic no mesmo host.
+
+Execute:
+    python benchmark.py consulta.mp3 --backend faster-whisper --runs 5
+    python benchmark.py --backend synthetic --duration 120
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import time
+
+import numpy as np
+
+from engines import BACKENDS, SAMPLE_RATE, create_engine
+from pipeline import _detect_speech
+
+
+def load_audio(path, duration):
+    """Decodifica o arquivo ou gera um áudio determinístico de `duration` segundos"""
+    if path:
+        from faster_whisper import decode_audio
+        return decode_audio(path, sampling_rate=SAMPLE_RATE)
+
+    rng = np.random.default_rng(0)
+    t = np.arange(int(duration * SAMPLE_RATE)) / SAMPLE_RATE
+    tone = 0.1 * np.sin(2 * np.pi * 220 * t)
+    return (tone + 0.01 * rng.standard_normal(t.shape)).astype(np.float32)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_benchmark(args):
+    audio = load_audio(args.audio, args.duration)
+    audio_seconds = audio.shape[0] / SAMPLE_RATE
+    if args.vad:
+        # VAD fora do motor, uma única vez: todos os backends recebem o mesmo
+        # áudio só com fala, como no serviço (nem todo backend aplica VAD)
+        audio = _detect_speech(audio, None).audio
+    speech_seconds = audio.shape[0] / SAMPLE_RATE
+
+    load_start = time.perf_counter()
+    engine = create_engine(args.backend, args.model, device=args.device, compute_type=args.compute_type)
+    load_seconds = time.perf_counter() - load_start
+
+    latencies = []
+    segments_count = 0
+    for run in range(args.warmup + args.runs):
+        start = time.perf_counter()
+        segments, _ = engine.transcribe(
+            audio,
+            language=args.language,
+            beam_size=args.beam_size,
+        )
+        segments_count = len(list(segments))
+        elapsed = time.perf_counter() - start
+
+        if run >= args.warmup:
+            latencies.append(elapsed)
+            print(f"  run {run - args.warmup + 1}/{args.runs}: {elapsed:.2f}s")
+
+    mean_latency = statistics.mean(latencies)
+    return {
+        **engine.describe(),
+        "host": platform.node(),
+        "audio_seconds": round(audio_seconds, 2),
+        "speech_seconds": round(speech_seconds, 2),
+        "beam_size": args.beam_size,
+        "vad_filter": args.vad,
+        "runs": args.runs,
+        "load_seconds": round(load_seconds, 3),
+        "latency_mean": round(mean_latency, 3),
+        "latency_p50": round(percentile(latencies, 0.5), 3),
+        "latency_p95": round(percentile(latencies, 0.95), 3),
+        "rtf": round(mean_latency / audio_seconds, 4) if audio_seconds else None,
+        "segments": segments_count,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos backends de transcrição")
+    parser.add_argument("audio", nargs="?", help="Arquivo de áudio (opcional)")
+    parser.add_argument("--backend", default="faster-whisper", choices=BACKENDS)
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--language", default="pt")
+    parser.add_argument("--beam-size", type=int, default=5)
+    parser.add_argument("--vad", action="store_true",
+                        help="Remover silêncio com o VAD antes de medir (igual para todos os backends)")
+    parser.add_argument("--duration", type=float, default=60.0,
+                        help="Duração do áudio gerado quando nenhum arquivo é informado")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    args = parser.parse_args()
+    if args.runs < 1:
+        parser.error("--runs deve ser pelo menos 1")
+
+    print(f"🏁 Benchmark: backend={args.backend} modelo={args.model}")
+    result = run_benchmark(args)
+    print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+CinthiaMed - Diagnóstico em produção
+Profiler por amostragem sob demanda (saída em stacks colapsadas, compatível
+com flamegraph.pl e speedscope) e gravador das requisições mais lentas com o
+tempo gasto em cada estágio. Nenhum áudio ou texto é armazenado.
+"""
+
+import contextvars
+import math
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+class ProfilerBusy(Exception):
+    """Já existe um profiling em andamento"""
+
+
+class SamplingProfiler:
+    """
+    Amostra periodicamente a pilha de todas as threads do processo
+
+    Roda em uma thread própria a cada `interval` segundos (máx. 1s) usando
+    `sys._current_frames()`, sem instrumentar o código, então o custo fica
+    restrito ao período pedido. Código nativo (CTranslate2, PyAV, ONNX)
+    aparece como o frame Python que o chamou.
+    """
+
+    MAX_SECONDS = 60.0
+    MAX_INTERVAL = 1.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _frame_label(frame) -> str:
+        code = frame.f_code
+        filename = os.path.basename(code.co_filename)
+        return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+    def run(self, seconds: float, interval: float = 0.01) -> Counter:
+        """
+        Amostra por `seconds` segundos (bloqueante; chamar fora do event loop)
+
+        Returns:
+            Counter de "thread;frame_raiz;...;frame_folha" -> número de amostras
+
+        Raises:
+            ProfilerBusy: se outro profiling estiver em andamento
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("Já existe um profiling em andamento")
+
+        try:
+            if not math.isfinite(seconds):
+                seconds = self.MAX_SECONDS
+            if not math.isfinite(interval):
+                interval = self.MAX_INTERVAL
+            seconds = min(max(seconds, 0.1), self.MAX_SECONDS)
+            interval = min(max(interval, 0.001), self.MAX_INTERVAL, seconds)
+            own_thread = threading.get_ident()
+            stacks = Counter()
+            deadline = time.monotonic() + seconds
+
+            while time.monotonic() < deadline:
+                thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_thread:
+                        continue
+                    labels = []
+                    while frame is not None:
+                        labels.append(self._frame_label(frame))
+                        frame = frame.f_back
+                    labels.append(thread_names.get(thread_id, str(thread_id)).replace(";", ":"))
+                    stacks[";".join(reversed(labels))] += 1
+                # Nunca dormir além do prazo, qualquer que seja o intervalo pedido
+                time.sleep(min(interval, max(0.0, deadline - time.monotonic())))
+
+            return stacks
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def collapsed(stacks: Counter) -> str:
+        """Formato de stacks colapsadas: uma linha "pilha contagem" por pilha"""
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class RequestTrace:
+    """Tempo por estágio e parâmetros de decodificação de uma requisição"""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.params: dict = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def finish(self, status_code: int) -> dict:
+        total = time.perf_counter() - self._start
+        stages = {name: round(seconds, 4) for name, seconds in self.stages.items()}
+        # Upload, validação, serialização da resposta e demais custos fora dos estágios
+        stages["other"] = round(max(0.0, total - sum(self.stages.values())), 4)
+        return {
+            "endpoint": self.endpoint,
+            "started_at": round(self.started_at, 3),
+            "status_code": status_code,
+            "total_seconds": round(total, 4),
+            "stages": stages,
+            "params": self.params,
+        }
+
+
+# Trace da requisição atual (definido pelo middleware em app.py)
+current_trace: contextvars.ContextVar[Optional[RequestTrace]] = contextvars.ContextVar(
+    "current_trace", default=None
+)
+
+
+@contextmanager
+def traced_stage(name: str):
+    """Mede um estágio na requisição atual (sem efeito fora de uma requisição)"""
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    with trace.stage(name):
+        yield
+
+
+def trace_params(**params):
+    """Registra parâmetros de decodificação na requisição atual"""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.params.update(params)
+
+
+class FlightRecorder:
+    """
+    Guarda as `capacity` requisições mais lentas dos últimos `window_seconds`
+
+    Sempre ativo: cada requisição custa apenas uma comparação com a mais
+    rápida já guardada.
+    """
+
+    def __init__(self, capacity: int = 20, window_seconds: float = 3600.0):
+        self.capacity = capacity
+        self.window_seconds = window_seconds
+        self._records: List[dict] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "FlightRecorder":
+        return cls(
+            capacity=int(os.getenv("SLOW_REQUESTS_CAPACITY", 20)),
+            window_seconds=float(os.getenv("SLOW_REQUESTS_WINDOW_SECONDS", 3600)),
+        )
+
+    def record(self, record: dict):
+        with self._lock:
+            self._prune()
+            if len(self._records) < self.capacity:
+                self._records.append(record)
+                return
+
+            fastest = min(range(len(self._records)), key=lambda i: self._records[i]["total_seconds"])
+            if record["total_seconds"] > self._records[fastest]["total_seconds"]:
+                self._records[fastest] = record
+
+    def _prune(self):
+        oldest_allowed = time.time() - self.window_seconds
+        self._records = [r for r in self._records if r["started_at"] >= oldest_allowed]
+
+    def slowest(self) -> List[dict]:
+        with self._lock:
+            self._prune()
+            return sorted(self._records, key=lambda r: r["total_seconds"], reverse=True)
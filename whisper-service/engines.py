@@ -0,0 +1,317 @@
+"""
+CinthiaMed - Motores de inferência
+Abstração usada pelos endpoints no lugar de chamar o WhisperModel direto.
+Backends: faster-whisper (padrão), ONNX Runtime / OpenVINO via Optimum e um
+backend sintético determinístico para testes de carga sem pesos de modelo.
+"""
+
+import hashlib
+import os
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+@dataclass
+class Word:
+    start: float
+    end: float
+    word: str
+    probability: float = 1.0
+
+
+@dataclass
+class Segment:
+    """Segmento transcrito (mesmos campos usados do Segment do faster-whisper)"""
+    start: float
+    end: float
+    text: str
+    avg_logprob: Optional[float] = None
+    compression_ratio: Optional[float] = None
+    no_speech_prob: Optional[float] = None
+    tokens: Optional[List[int]] = None
+    words: Optional[List[Word]] = None
+
+
+@dataclass
+class TranscriptionInfo:
+    language: str
+    language_probability: float
+    duration: float
+
+
+class TranscriptionEngine(ABC):
+    """
+    Interface comum dos backends de transcrição
+
+    `transcribe` recebe PCM float32 16 kHz mono e retorna
+    (iterador de segmentos, info), como o faster-whisper: a inferência pode
+    acontecer de forma preguiçosa enquanto os segmentos são consumidos.
+    """
+
+    name = "base"
+
+    def __init__(self, model_size: str):
+        self.model_size = model_size
+
+    @abstractmethod
+    def transcribe(
+        self,
+        audio: np.ndarray,
+        language: Optional[str] = None,
+        initial_prompt: Optional[str] = None,
+        beam_size: int = 5,
+        vad_filter: bool = False,
+        vad_parameters: Optional[dict] = None,
+        word_timestamps: bool = False,
+        temperature: Optional[float] = None,
+    ) -> Tuple[Iterable, TranscriptionInfo]:
+        """
+        `temperature=None` (ou 0) usa o fallback de temperatura padrão do
+        Whisper; um valor positivo fixa a temperatura de amostragem.
+        """
+
+    def describe(self) -> dict:
+        """Identificação do backend para health check e benchmark"""
+        return {"backend": self.name, "model": self.model_size}
+
+
+class FasterWhisperEngine(TranscriptionEngine):
+    """Backend padrão: faster-whisper (CTranslate2)"""
+
+    name = "faster-whisper"
+
+    def __init__(self, model_size: str, device: str = "cpu", compute_type: str = "int8"):
+        from faster_whisper import WhisperModel
+
+        super().__init__(model_size)
+        self.device = device
+        self.compute_type = compute_type
+        self.model = WhisperModel(
+            model_size,
+            device=device,
+            compute_type=compute_type,
+            download_root="./models"  # Cache dos modelos
+        )
+
+    def transcribe(self, audio, language=None, initial_prompt=None, beam_size=5,
+                   vad_filter=False, vad_parameters=None, word_timestamps=False,
+                   temperature=None):
+        options = {}
+        if temperature:
+            options["temperature"] = temperature
+
+        return self.model.transcribe(
+            audio,
+            language=language,
+            initial_prompt=initial_prompt,
+            beam_size=beam_size,
+            vad_filter=vad_filter,
+            vad_parameters=vad_parameters,
+            word_timestamps=word_timestamps,
+            **options,
+        )
+
+    def describe(self):
+        return {**super().describe(), "device": self.device, "compute_type": self.compute_type}
+
+
+class OptimumWhisperEngine(TranscriptionEngine):
+    """
+    Backend opcional em CPU via Hugging Face Optimum (ONNX Runtime ou OpenVINO)
+
+    Dependências extras (não estão no requirements.txt):
+        pip install "optimum[onnxruntime]" transformers   # runtime=onnx
+        pip install "optimum[openvino]" transformers      # runtime=openvino
+
+    O áudio é processado em janelas de 30s; cada janela vira um segmento.
+    A exportação do PyTorch acontece só na primeira carga e fica salva em
+    ./models/<runtime>/; as próximas cargas usam o modelo já exportado.
+    """
+
+    WINDOW_SECONDS = 30
+
+    def __init__(self, model_size: str, runtime: str = "onnx"):
+        from transformers import WhisperProcessor
+
+        if runtime == "openvino":
+            from optimum.intel import OVModelForSpeechSeq2Seq as ModelClass
+        else:
+            from optimum.onnxruntime import ORTModelForSpeechSeq2Seq as ModelClass
+
+        super().__init__(model_size)
+        self.name = runtime
+        model_id = model_size if "/" in model_size else f"openai/whisper-{model_size}"
+        export_dir = os.path.join("./models", runtime, model_id.replace("/", "--"))
+
+        if os.path.isdir(export_dir):
+            self.processor = WhisperProcessor.from_pretrained(export_dir)
+            self.model = ModelClass.from_pretrained(export_dir)
+        else:
+            # Primeira carga: exporta uma vez (exige torch) e salva para as próximas
+            self.processor = WhisperProcessor.from_pretrained(model_id, cache_dir="./models")
+            self.model = ModelClass.from_pretrained(model_id, export=True, cache_dir="./models")
+            # Salva em diretório temporário: uma exportação interrompida não é reutilizada
+            partial_dir = export_dir + ".partial"
+            self.model.save_pretrained(partial_dir)
+            self.processor.save_pretrained(partial_dir)
+            os.replace(partial_dir, export_dir)
+
+    def transcribe(self, audio, language=None, initial_prompt=None, beam_size=5,
+                   vad_filter=False, vad_parameters=None, word_timestamps=False,
+                   temperature=None):
+        # Sem timestamps por palavra neste backend: `word_timestamps` é ignorado
+        duration = audio.shape[0] / SAMPLE_RATE
+        info = TranscriptionInfo(
+            language=language or "unknown",
+            language_probability=1.0 if language else 0.0,
+            duration=duration,
+        )
+        return self._generate_segments(audio, language, initial_prompt, beam_size, temperature), info
+
+    def _generate_segments(self, audio, language, initial_prompt, beam_size,
+                           temperature) -> Iterator[Segment]:
+        window = self.WINDOW_SECONDS * SAMPLE_RATE
+        generate_kwargs = {"num_beams": beam_size, "task": "transcribe"}
+        if temperature:
+            generate_kwargs.update(do_sample=True, temperature=temperature)
+        if language:
+            generate_kwargs["language"] = language
+        if initial_prompt:
+            generate_kwargs["prompt_ids"] = self.processor.get_prompt_ids(
+                initial_prompt, return_tensors="pt"
+            )
+
+        for offset in range(0, audio.shape[0], window):
+            chunk = audio[offset:offset + window]
+            features = self.processor(
+                chunk, sampling_rate=SAMPLE_RATE, return_tensors="pt"
+            ).input_features
+            token_ids = self.model.generate(features, **generate_kwargs)
+            text = self.processor.batch_decode(token_ids, skip_special_tokens=True)[0]
+            if initial_prompt and text.strip().startswith(initial_prompt.strip()):
+                text = text.strip()[len(initial_prompt.strip()):]
+
+            yield Segment(
+                start=offset / SAMPLE_RATE,
+                end=(offset + chunk.shape[0]) / SAMPLE_RATE,
+                text=" " + text.strip(),
+            )
+
+
+class SyntheticEngine(TranscriptionEngine):
+    """
+    Backend sintético e determinístico para testes de carga
+
+    Não carrega pesos: gera um segmento a cada `segment_seconds` de áudio com
+    texto derivado do hash do áudio (mesma entrada -> mesma saída) e simula a
+    latência `fixed_latency_ms + rtf * duração`. Com `busy=True` a latência
+    consome CPU de verdade em vez de apenas dormir.
+    """
+
+    name = "synthetic"
+
+    WORDS = [
+        "paciente", "refere", "dor", "febre", "há", "três", "dias", "sem",
+        "dispneia", "pressão", "arterial", "controlada", "exame", "normal",
+        "prescrevo", "paracetamol", "retorno", "em", "uma", "semana",
+    ]
+
+    def __init__(self, model_size: str = "synthetic", rtf: float = 0.1,
+                 fixed_latency_ms: float = 50.0, segment_seconds: float = 5.0,
+                 busy: bool = False):
+        super().__init__(model_size)
+        self.rtf = rtf
+        self.fixed_latency_ms = fixed_latency_ms
+        self.segment_seconds = segment_seconds
+        self.busy = busy
+
+    @classmethod
+    def from_env(cls, model_size: str) -> "SyntheticEngine":
+        return cls(
+            model_size=model_size,
+            rtf=float(os.getenv("SYNTHETIC_RTF", 0.1)),
+            fixed_latency_ms=float(os.getenv("SYNTHETIC_FIXED_LATENCY_MS", 50)),
+            segment_seconds=float(os.getenv("SYNTHETIC_SEGMENT_SECONDS", 5)),
+            busy=os.getenv("SYNTHETIC_BUSY", "false").lower() == "true",
+        )
+
+    def transcribe(self, audio, language=None, initial_prompt=None, beam_size=5,
+                   vad_filter=False, vad_parameters=None, word_timestamps=False,
+                   temperature=None):
+        duration = audio.shape[0] / SAMPLE_RATE
+        info = TranscriptionInfo(
+            language=language or "pt",
+            language_probability=1.0,
+            duration=duration,
+        )
+        self._wait(self.fixed_latency_ms / 1000)
+        return self._generate_segments(audio, duration, beam_size, word_timestamps), info
+
+    def _wait(self, seconds: float):
+        if seconds <= 0:
+            return
+        if not self.busy:
+            time.sleep(seconds)
+            return
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            pass
+
+    def _generate_segments(self, audio, duration, beam_size, word_timestamps) -> Iterator[Segment]:
+        digest = hashlib.sha256(np.ascontiguousarray(audio).tobytes()).digest()
+        start = 0.0
+        index = 0
+        while start < duration:
+            end = min(duration, start + self.segment_seconds)
+            # Beam maior custa mais, como no modelo real
+            self._wait((end - start) * self.rtf * max(beam_size, 1) / 5)
+
+            segment_digest = hashlib.sha256(digest + index.to_bytes(4, "little")).digest()
+            words = [self.WORDS[segment_digest[i] % len(self.WORDS)] for i in range(4)]
+            word_step = (end - start) / len(words)
+            yield Segment(
+                start=round(start, 2),
+                end=round(end, 2),
+                text=" " + " ".join(words) + ".",
+                avg_logprob=-0.2,
+                compression_ratio=1.2,
+                no_speech_prob=0.01,
+                words=[
+                    Word(
+                        start=round(start + i * word_step, 2),
+                        end=round(start + (i + 1) * word_step, 2),
+                        word=" " + word,
+                    )
+                    for i, word in enumerate(words)
+                ] if word_timestamps else None,
+            )
+            start = end
+            index += 1
+
+
+BACKENDS = ("faster-whisper", "onnx", "openvino", "synthetic")
+
+
+def create_engine(backend: str, model_size: str, device: str = "cpu",
+                  compute_type: str = "int8") -> TranscriptionEngine:
+    """
+    Cria o backend configurado para o deploy (ENGINE_BACKEND)
+
+    Raises:
+        ValueError: se o backend não for conhecido
+    """
+    backend = backend.lower()
+    if backend == "faster-whisper":
+        return FasterWhisperEngine(model_size, device=device, compute_type=compute_type)
+    if backend in ("onnx", "openvino"):
+        return OptimumWhisperEngine(model_size, runtime=backend)
+    if backend == "synthetic":
+        return SyntheticEngine.from_env(model_size)
+
+    raise ValueError(f"Backend desconhecido: {backend} (opções: {', '.join(BACKENDS)})")
@@ -0,0 +1,190 @@
+"""
+CinthiaMed - Guarda contra alucinação e loops de repetição
+Observa os segmentos à medida que o modelo os produz, sinaliza ou descarta os
+suspeitos (repetição de n-gramas, taxa de compressão alta, log-prob baixa,
+silêncio) e interrompe a decodificação quando eles se acumulam, retomando
+depois do trecho, para não gastar minutos de CPU gerando lixo em trechos
+silenciosos ou ruidosos.
+"""
+
+import os
+import re
+import zlib
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+KEEP = "keep"
+SKIP = "skip"
+ABORT = "abort"
+
+
+def compression_ratio(text: str) -> float:
+    """Mesma métrica do Whisper: texto repetitivo comprime muito"""
+    text_bytes = text.encode("utf-8")
+    if not text_bytes:
+        return 0.0
+    return len(text_bytes) / len(zlib.compress(text_bytes))
+
+
+@dataclass
+class GuardConfig:
+    enabled: bool = True
+    max_compression_ratio: float = 2.4
+    min_avg_logprob: float = -1.0
+    max_no_speech_prob: float = 0.6
+    ngram_size: int = 3
+    max_ngram_repeats: int = 4
+    history_words: int = 60
+    max_consecutive_bad: int = 3
+    skip_seconds: float = 30.0
+    max_resumes: int = 3
+    max_flags: int = 50
+
+    @classmethod
+    def from_env(cls) -> "GuardConfig":
+        return cls(
+            enabled=os.getenv("GUARD_ENABLED", "true").lower() == "true",
+            max_compression_ratio=float(os.getenv("GUARD_MAX_COMPRESSION_RATIO", 2.4)),
+            min_avg_logprob=float(os.getenv("GUARD_MIN_AVG_LOGPROB", -1.0)),
+            max_no_speech_prob=float(os.getenv("GUARD_MAX_NO_SPEECH_PROB", 0.6)),
+            ngram_size=int(os.getenv("GUARD_NGRAM_SIZE", 3)),
+            max_ngram_repeats=int(os.getenv("GUARD_MAX_NGRAM_REPEATS", 4)),
+            max_consecutive_bad=int(os.getenv("GUARD_MAX_CONSECUTIVE_BAD", 3)),
+            skip_seconds=float(os.getenv("GUARD_SKIP_SECONDS", 30)),
+            max_resumes=int(os.getenv("GUARD_MAX_RESUMES", 3)),
+        )
+
+
+class HallucinationGuard:
+    """
+    Avalia cada segmento em ordem (uma instância por requisição)
+
+    `check` retorna KEEP, SKIP (descartar o segmento) ou ABORT (descartar e
+    parar a decodificação atual). Depois de um ABORT, `resume_at` diz onde
+    retomar: `skip_seconds` adiante, até `max_resumes` vezes; depois disso a
+    decodificação para de vez, limitando a CPU gasta com áudio patológico.
+    Cada segmento suspeito é registrado em `flags` (até `max_flags`) com o
+    trecho, o motivo e a ação, sem o texto.
+
+    Repetição sozinha não descarta nada: posologias ("de 8 em 8 horas") e
+    respostas curtas ("Sim.") se repetem na fala real. Ela só descarta quando
+    o modelo também está inseguro (log-prob baixa ou provável não-fala). Log-prob
+    baixa sozinha é sinalizada, mas o segmento é mantido e não conta para o ABORT.
+    """
+
+    def __init__(self, config: GuardConfig):
+        self.config = config
+        self.flags: List[dict] = []
+        self.aborted = False
+        self.stopped = False
+        self.resumes = 0
+        self.skipped_segments = 0
+        self.flags_dropped = 0
+        self._consecutive_bad = 0
+        self._history = deque(maxlen=config.history_words)
+        self._last_text: Optional[str] = None
+
+    def _reason(self, segment) -> Tuple[Optional[str], bool]:
+        """(motivo ou None, descartar o segmento?)"""
+        config = self.config
+        text = segment.text.strip()
+        avg_logprob = getattr(segment, "avg_logprob", None)
+        no_speech_prob = getattr(segment, "no_speech_prob", None)
+        low_logprob = avg_logprob is not None and avg_logprob < config.min_avg_logprob
+        likely_silence = no_speech_prob is not None and no_speech_prob > config.max_no_speech_prob
+
+        # Mesmo critério do Whisper para silêncio: provável não-fala e baixa confiança
+        if likely_silence and low_logprob:
+            return "no_speech", True
+
+        ratio = getattr(segment, "compression_ratio", None)
+        if ratio is None:
+            ratio = compression_ratio(text)
+        if ratio > config.max_compression_ratio:
+            return "compression_ratio", True
+
+        if low_logprob or likely_silence:
+            normalized = text.lower()
+            if normalized and normalized == self._last_text:
+                return "repeated_segment", True
+
+            words = re.findall(r"\w+", normalized)
+            n = config.ngram_size
+            history = list(self._history)
+            window = history + words
+            ngrams = [tuple(window[i:i + n]) for i in range(len(window) - n + 1)]
+            counts = Counter(ngrams)
+            # Só n-gramas com ao menos uma palavra deste segmento: repetição que
+            # existe apenas na fala já mantida não condena o segmento atual
+            current = ngrams[max(0, len(history) - n + 1):]
+            if any(counts[ngram] >= config.max_ngram_repeats for ngram in current):
+                return "ngram_repetition", True
+
+        if low_logprob:
+            return "low_logprob", False
+
+        return None, False
+
+    def check(self, segment) -> str:
+        if not self.config.enabled:
+            return KEEP
+
+        reason, discard = self._reason(segment)
+        if not discard:
+            # Fala mantida interrompe a sequência de segmentos ruins
+            self._consecutive_bad = 0
+            self._last_text = segment.text.strip().lower()
+            self._history.extend(re.findall(r"\w+", self._last_text))
+            if reason is not None:
+                self.flag(segment.start, segment.end, reason, KEEP)
+            return KEEP
+
+        self.skipped_segments += 1
+        self._consecutive_bad += 1
+        if self._consecutive_bad >= self.config.max_consecutive_bad:
+            self.aborted = True
+            self._consecutive_bad = 0
+            action = ABORT
+        else:
+            action = SKIP
+
+        self.flag(segment.start, segment.end, reason, action)
+        return action
+
+    def resume_at(self, end: float) -> Optional[float]:
+        """
+        Onde retomar depois de um ABORT que ocorreu em `end` (segundos)
+
+        O trecho logo após um loop costuma continuar no loop, então a retomada
+        pula `skip_seconds`. Esgotadas as `max_resumes` retomadas, retorna None
+        e a decodificação para.
+        """
+        if self.resumes >= self.config.max_resumes:
+            self.stopped = True
+            return None
+        self.resumes += 1
+        return end + self.config.skip_seconds
+
+    def flag(self, start: float, end: float, reason: str, action: str):
+        """Registra um trecho suspeito (acima de `max_flags` só conta)"""
+        if len(self.flags) >= self.config.max_flags:
+            self.flags_dropped += 1
+            return
+        self.flags.append({
+            "start": round(start, 2),
+            "end": round(end, 2),
+            "reason": reason,
+            "action": action,
+        })
+
+    def report(self) -> dict:
+        """Resumo para `metadata.guard`"""
+        return {
+            "skipped_segments": self.skipped_segments,
+            "aborted": self.aborted,
+            "resumes": self.resumes,
+            "stopped": self.stopped,
+            "flags": self.flags,
+            "flags_dropped": self.flags_dropped,
+        }
@@ -0,0 +1,106 @@
+"""
+CinthiaMed - Compatibilidade com a API de transcrição da OpenAI
+Formatos de resposta do POST /v1/audio/transcriptions (json, text, srt,
+verbose_json, vtt) e erros no formato {"error": {...}} esperado pelo SDK.
+"""
+
+from typing import List, Optional
+
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+RESPONSE_FORMATS = ("json", "text", "srt", "verbose_json", "vtt")
+TIMESTAMP_GRANULARITIES = ("word", "segment")
+
+# Nomes que o SDK da OpenAI envia no campo `model` e que usam o modelo padrão
+DEFAULT_MODEL_ALIASES = ("whisper-1",)
+
+# A OpenAI devolve o nome do idioma por extenso no verbose_json
+LANGUAGE_NAMES = {
+    "pt": "portuguese",
+    "en": "english",
+    "es": "spanish",
+    "fr": "french",
+    "de": "german",
+    "it": "italian",
+}
+
+
+def format_timestamp(seconds: float, decimal_marker: str = ",") -> str:
+    milliseconds = int(round(max(seconds, 0.0) * 1000))
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{decimal_marker}{milliseconds:03d}"
+
+
+def to_srt(segments: List[dict]) -> str:
+    blocks = []
+    for index, segment in enumerate(segments, start=1):
+        blocks.append(
+            f"{index}\n"
+            f"{format_timestamp(segment['start'])} --> {format_timestamp(segment['end'])}\n"
+            f"{segment['text']}\n"
+        )
+    return "\n".join(blocks)
+
+
+def to_vtt(segments: List[dict]) -> str:
+    blocks = ["WEBVTT\n"]
+    for segment in segments:
+        blocks.append(
+            f"{format_timestamp(segment['start'], '.')} --> {format_timestamp(segment['end'], '.')}\n"
+            f"{segment['text']}\n"
+        )
+    return "\n".join(blocks)
+
+
+def verbose_json(text: str, segments: List[dict], language: str, duration: float,
+                 granularities: List[str]) -> dict:
+    """Corpo do `verbose_json` com `segments` e/ou `words` conforme as granularidades"""
+    body = {
+        "task": "transcribe",
+        "language": LANGUAGE_NAMES.get(language, language),
+        "duration": round(duration, 2),
+        "text": text,
+    }
+
+    if "word" in granularities:
+        body["words"] = [word for segment in segments for word in segment.get("words") or []]
+
+    if "segment" in granularities or not granularities:
+        body["segments"] = [
+            {key: value for key, value in segment.items() if key != "words"}
+            for segment in segments
+        ]
+
+    return body
+
+
+def render(response_format: str, text: str, segments: List[dict], language: str,
+           duration: float, granularities: List[str]):
+    """Resposta HTTP no formato pedido em `response_format`"""
+    if response_format == "text":
+        return PlainTextResponse(text + "\n")
+    if response_format == "srt":
+        return PlainTextResponse(to_srt(segments))
+    if response_format == "vtt":
+        return PlainTextResponse(to_vtt(segments))
+    if response_format == "verbose_json":
+        return JSONResponse(verbose_json(text, segments, language, duration, granularities))
+    return JSONResponse({"text": text})
+
+
+def error_response(status_code: int, message: str, param: Optional[str] = None,
+                   headers: Optional[dict] = None) -> JSONResponse:
+    """Erro no formato da OpenAI (o SDK lê `error.message`)"""
+    error_type = {
+        429: "rate_limit_exceeded",
+        503: "server_error",
+        500: "server_error",
+    }.get(status_code, "invalid_request_error")
+
+    return JSONResponse(
+        status_code=status_code,
+        content={"error": {"message": message, "type": error_type, "param": param, "code": None}},
+        headers=headers,
+    )
@@ -0,0 +1,237 @@
+"""
+CinthiaMed - Pipeline de transcrição em estágios
+decode/resample -> VAD -> inferência, cada estágio com seu próprio pool de
+threads e fila limitada. Enquanto o modelo transcreve uma requisição, as
+próximas já estão sendo decodificadas e segmentadas, então o slot de
+inferência não fica ocioso esperando o ffmpeg/PyAV.
+"""
+
+import asyncio
+import io
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from engines import SAMPLE_RATE
+
+
+class StageBusy(Exception):
+    """Fila do estágio cheia (vira HTTP 503)"""
+
+    def __init__(self, stage: str, retry_after: float = 1.0):
+        super().__init__(f"Estágio '{stage}' sobrecarregado, tente novamente")
+        self.stage = stage
+        self.retry_after = retry_after
+
+
+class Stage:
+    """
+    Estágio do pipeline: pool de threads + fila limitada + contadores
+
+    `max_queue` é o número de tarefas que podem esperar além das que estão
+    executando; acima disso `run` levanta StageBusy em vez de enfileirar.
+    """
+
+    UTILIZATION_WINDOW = 60.0
+
+    def __init__(self, name: str, workers: int, max_queue: int):
+        self.name = name
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"stage-{name}")
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._busy = deque()  # (início, fim) das execuções recentes
+        self._running_since = {}
+
+    async def run(self, fn, *args, **kwargs):
+        with self._lock:
+            if self.queued >= self.max_queue + max(0, self.workers - self.active):
+                raise StageBusy(self.name)
+            self.queued += 1
+
+        def job():
+            started = time.monotonic()
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+                self._running_since[threading.get_ident()] = started
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                finished = time.monotonic()
+                with self._lock:
+                    self.active -= 1
+                    self._running_since.pop(threading.get_ident(), None)
+                    if ok:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+                    self._busy.append((started, finished))
+                    self._trim(finished)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, job)
+
+    def _trim(self, now: float):
+        while self._busy and self._busy[0][1] < now - self.UTILIZATION_WINDOW:
+            self._busy.popleft()
+
+    def utilization(self) -> float:
+        """Fração do tempo de workers ocupada na última janela (0.0 a 1.0)"""
+        now = time.monotonic()
+        window_start = now - self.UTILIZATION_WINDOW
+        with self._lock:
+            self._trim(now)
+            intervals = list(self._busy) + [(s, now) for s in self._running_since.values()]
+        busy = sum(max(0.0, end - max(start, window_start)) for start, end in intervals)
+        return min(1.0, busy / (self.UTILIZATION_WINDOW * self.workers))
+
+    def snapshot(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "queued": self.queued,
+            "active": self.active,
+            "completed": self.completed,
+            "failed": self.failed,
+            "utilization": round(self.utilization(), 3),
+        }
+
+
+@dataclass
+class SpeechAudio:
+    """Saída do estágio de VAD: apenas os trechos com fala, prontos para o modelo"""
+    audio: np.ndarray
+    chunks: Optional[List[dict]]  # amostras de início/fim no áudio original
+    duration: float  # duração do áudio original (segundos)
+
+    @classmethod
+    def from_chunks(cls, audio: np.ndarray, chunks: List[dict]) -> "SpeechAudio":
+        from faster_whisper.vad import collect_chunks
+
+        duration = audio.shape[0] / SAMPLE_RATE
+        if not chunks:
+            return cls(np.zeros(0, dtype=np.float32), chunks, duration)
+
+        audio_chunks, _ = collect_chunks(audio, chunks)
+        return cls(np.concatenate(audio_chunks, axis=0), chunks, duration)
+
+    @property
+    def has_speech(self) -> bool:
+        return self.audio.shape[0] > 0
+
+    def original_time(self, seconds: float) -> float:
+        """Converte um instante do áudio sem silêncio para o áudio original"""
+        if not self.chunks:
+            return seconds
+
+        from faster_whisper.vad import SpeechTimestampsMap
+        return SpeechTimestampsMap(self.chunks, SAMPLE_RATE).get_original_time(seconds)
+
+    def restore_timestamps(self, segments: Iterable) -> Iterable:
+        """Converte tempos relativos ao áudio sem silêncio para o áudio original"""
+        if not self.chunks:
+            return segments
+
+        from faster_whisper.transcribe import restore_speech_timestamps
+        return restore_speech_timestamps(segments, self.chunks, SAMPLE_RATE)
+
+
+class OffsetSegments:
+    """
+    Soma `offset` segundos aos tempos dos segmentos (e das palavras)
+
+    Usado quando a inferência recomeça no meio do áudio só com fala; `last_end`
+    guarda o fim do último segmento entregue, ainda nesse tempo (antes de
+    `restore_timestamps`), que é onde uma nova decodificação pode começar.
+    """
+
+    def __init__(self, segments: Iterable, offset: float):
+        self.segments = segments
+        self.offset = offset
+        self.last_end = offset
+
+    def __iter__(self):
+        for segment in self.segments:
+            if self.offset:
+                segment.start += self.offset
+                segment.end += self.offset
+                for word in getattr(segment, "words", None) or []:
+                    word.start += self.offset
+                    word.end += self.offset
+            self.last_end = segment.end
+            yield segment
+
+
+def _decode(content: bytes) -> np.ndarray:
+    from faster_whisper import decode_audio
+    return decode_audio(io.BytesIO(content), sampling_rate=SAMPLE_RATE)
+
+
+def _detect_speech(audio: np.ndarray, vad_parameters: Optional[dict],
+                   chunks: Optional[List[dict]] = None) -> SpeechAudio:
+    if chunks is None:
+        from faster_whisper.vad import VadOptions, get_speech_timestamps
+        chunks = get_speech_timestamps(audio, VadOptions(**(vad_parameters or {})))
+
+    return SpeechAudio.from_chunks(audio, chunks)
+
+
+class TranscriptionPipeline:
+    """Os três estágios do serviço e suas filas"""
+
+    def __init__(self, decode_workers: int = 2, vad_workers: int = 1,
+                 inference_workers: int = 1, max_queue: int = 8):
+        self.decode_stage = Stage("decode", decode_workers, max_queue)
+        self.vad_stage = Stage("vad", vad_workers, max_queue)
+        # A fila de inferência é a fila justa do controle de admissão (quota.py,
+        # limitada por STAGE_MAX_QUEUE); aqui só entra quem já tem um dos slots,
+        # então este estágio não tem fila própria
+        self.inference_stage = Stage("inference", inference_workers, max_queue=0)
+
+    @classmethod
+    def from_env(cls) -> "TranscriptionPipeline":
+        return cls(
+            decode_workers=int(os.getenv("DECODE_WORKERS", 2)),
+            vad_workers=int(os.getenv("VAD_WORKERS", 1)),
+            inference_workers=int(os.getenv("INFERENCE_CONCURRENCY", 1)),
+            max_queue=int(os.getenv("STAGE_MAX_QUEUE", 8)),
+        )
+
+    async def decode(self, content: bytes) -> np.ndarray:
+        """Estágio 1: container -> PCM float32 16 kHz mono"""
+        return await self.decode_stage.run(_decode, content)
+
+    async def detect_speech(self, audio: np.ndarray, vad_parameters: Optional[dict] = None,
+                            chunks: Optional[List[dict]] = None) -> SpeechAudio:
+        """
+        Estágio 2: VAD (Silero) e remoção dos trechos de silêncio
+
+        Com `chunks` (mapa de fala já calculado, vindo do cache) o Silero não é executado.
+        """
+        return await self.vad_stage.run(_detect_speech, audio, vad_parameters, chunks)
+
+    async def infer(self, fn, *args, **kwargs):
+        """Estágio 3: executa `fn` (que chama o motor) no pool de inferência"""
+        return await self.inference_stage.run(fn, *args, **kwargs)
+
+    def snapshot(self, inference_queue: Optional[dict] = None) -> dict:
+        """`inference_queue` substitui `queued`/`max_queue` da inferência pelos da fila justa"""
+        return {
+            "decode": self.decode_stage.snapshot(),
+            "vad": self.vad_stage.snapshot(),
+            "inference": {**self.inference_stage.snapshot(), **(inference_queue or {})},
+        }
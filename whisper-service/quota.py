@@ -0,0 +1,332 @@
+"""
+CinthiaMed - Controle de admissão por segundos de áudio
+Cobra cada cliente (clínica ou API key) pela duração do áudio decodificado
+e distribui o slot de inferência entre clientes com fila justa ponderada
+"""
+
+import asyncio
+import hashlib
+import heapq
+import itertools
+import math
+import os
+import time
+from typing import Dict, Optional
+
+from pipeline import StageBusy
+
+
+def parse_api_keys(value: str) -> Dict[str, str]:
+    """
+    API_KEYS no formato "chave-a=clinica-a,chave-b=clinica-b"
+
+    Returns:
+        {sha256 da chave: clínica} (o texto da chave não fica em memória)
+    """
+    keys = {}
+    for item in value.split(","):
+        if "=" in item:
+            api_key, clinic_id = item.split("=", 1)
+            keys[hashlib.sha256(api_key.strip().encode()).hexdigest()] = clinic_id.strip()
+    return keys
+
+
+class QuotaExceeded(Exception):
+    """Requisição recusada pelo controle de admissão (vira HTTP 429)"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Balde de tokens medido em segundos de áudio
+
+    O balde enche a `rate` segundos de áudio por segundo de relógio até
+    `capacity`. Um áudio maior que a capacidade é aceito quando o balde
+    está cheio e deixa o saldo negativo, para que arquivos longos não sejam
+    bloqueados para sempre - o cliente apenas espera mais depois.
+    """
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = max(0.0, now - self.updated_at)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+    def is_full(self, now: float) -> bool:
+        """Balde cheio: equivalente a um balde novo, pode ser descartado"""
+        return self.tokens + max(0.0, now - self.updated_at) * self.rate >= self.capacity
+
+    def try_consume(self, cost: float, now: Optional[float] = None) -> float:
+        """
+        Tenta consumir `cost` segundos de áudio
+
+        Returns:
+            0.0 se consumiu, senão os segundos até haver saldo suficiente
+        """
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+
+        required = min(cost, self.capacity)
+        if self.tokens >= required:
+            self.tokens -= cost
+            return 0.0
+
+        if self.rate <= 0:
+            return math.inf
+        return (required - self.tokens) / self.rate
+
+
+class FairScheduler:
+    """
+    Fila justa ponderada (WFQ) para os slots de inferência
+
+    Cada requisição recebe uma etiqueta de término virtual
+    `max(tempo_virtual, último_término_do_cliente) + custo / peso`; quando um
+    slot libera, a menor etiqueta é atendida. Assim um cliente com muitos
+    uploads grandes na fila não impede os demais de avançarem.
+
+    Etiquetas que já ficaram para trás do tempo virtual não influenciam mais a
+    ordem e são descartadas, assim como todas quando o escalonador fica ocioso.
+    """
+
+    # Retry-After da fila cheia: a fila anda em segundos de relógio, não na
+    # duração do áudio enviado, então um valor curto e fixo
+    QUEUE_RETRY_AFTER = 5.0
+
+    def __init__(self, slots: int = 1, max_pending_per_tenant: int = 4, max_queue: int = 8):
+        self.slots = max(1, slots)
+        self.max_pending_per_tenant = max_pending_per_tenant
+        self.max_queue = max_queue
+        self.in_use = 0
+        self.virtual_time = 0.0
+        self._finish_tags: Dict[str, float] = {}
+        self._pending: Dict[str, int] = {}
+        self._heap = []
+        self._seq = itertools.count()
+
+    async def acquire(self, tenant: str, cost: float, weight: float = 1.0):
+        """
+        Aguarda um slot de inferência respeitando a ordem justa
+
+        Esta é a fila do estágio de inferência: cada requisição esperando
+        segura o PCM decodificado, então ela é limitada por cliente
+        (`max_pending_per_tenant`, 429) e no total (`max_queue`, 503).
+
+        Raises:
+            QuotaExceeded: fila do cliente cheia
+            StageBusy: fila de inferência cheia
+        """
+        start = max(self.virtual_time, self._finish_tags.get(tenant, 0.0))
+        finish = start + cost / max(weight, 1e-6)
+
+        if self.in_use < self.slots and not self._heap:
+            self._finish_tags[tenant] = finish
+            self.in_use += 1
+            self.virtual_time = start
+            self._prune_finish_tags()
+            return
+
+        if self._pending.get(tenant, 0) >= self.max_pending_per_tenant:
+            raise QuotaExceeded(
+                f"Muitas requisições na fila para o cliente "
+                f"(máximo: {self.max_pending_per_tenant})",
+                retry_after=self.QUEUE_RETRY_AFTER,
+            )
+        if self.waiting() >= self.max_queue:
+            raise StageBusy("inference", retry_after=self.QUEUE_RETRY_AFTER)
+
+        self._finish_tags[tenant] = finish
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (finish, next(self._seq), start, tenant, future))
+        self._pending[tenant] = self._pending.get(tenant, 0) + 1
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Cliente desconectou: se o slot já tinha sido concedido, devolver
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        finally:
+            self._pending[tenant] -= 1
+            if not self._pending[tenant]:
+                del self._pending[tenant]
+
+    def release(self):
+        """Libera um slot e acorda a próxima requisição da fila"""
+        while self._heap:
+            _, _, start, _, future = heapq.heappop(self._heap)
+            if future.done():
+                continue
+            self.virtual_time = start
+            self._prune_finish_tags()
+            future.set_result(None)
+            return
+        self.in_use = max(0, self.in_use - 1)
+        if not self.in_use:
+            # Ocioso: um novo período de disputa começa sem histórico
+            self._finish_tags.clear()
+
+    def _prune_finish_tags(self):
+        stale = [tenant for tenant, finish in self._finish_tags.items() if finish <= self.virtual_time]
+        for tenant in stale:
+            del self._finish_tags[tenant]
+
+    def waiting(self) -> int:
+        """Requisições aguardando um slot"""
+        return sum(self._pending.values())
+
+    def queue_depth(self) -> int:
+        return sum(1 for entry in self._heap if not entry[-1].done())
+
+
+class AdmissionController:
+    """Combina o balde de tokens por cliente com a fila justa de inferência"""
+
+    # Intervalo mínimo entre as varreduras de baldes cheios
+    PRUNE_INTERVAL = 60.0
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        audio_seconds_per_minute: float = 600.0,
+        burst_seconds: float = 1800.0,
+        inference_slots: int = 1,
+        max_pending_per_tenant: int = 4,
+        max_queue: int = 8,
+        tenant_weights: Optional[Dict[str, float]] = None,
+    ):
+        self.enabled = enabled
+        self.rate = audio_seconds_per_minute / 60.0
+        self.burst_seconds = burst_seconds
+        self.tenant_weights = tenant_weights or {}
+        self.scheduler = FairScheduler(inference_slots, max_pending_per_tenant, max_queue)
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._pruned_at = time.monotonic()
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        """
+        Cria o controlador a partir das variáveis de ambiente
+
+        QUOTA_TENANT_WEIGHTS usa o formato "clinica-a=2,clinica-b=0.5"
+        """
+        weights = {}
+        for item in os.getenv("QUOTA_TENANT_WEIGHTS", "").split(","):
+            if "=" in item:
+                tenant, weight = item.split("=", 1)
+                weights[tenant.strip()] = float(weight)
+
+        return cls(
+            enabled=os.getenv("QUOTA_ENABLED", "true").lower() == "true",
+            audio_seconds_per_minute=float(os.getenv("QUOTA_AUDIO_SECONDS_PER_MINUTE", 600)),
+            burst_seconds=float(os.getenv("QUOTA_BURST_SECONDS", 1800)),
+            inference_slots=int(os.getenv("INFERENCE_CONCURRENCY", 1)),
+            max_pending_per_tenant=int(os.getenv("QUOTA_MAX_PENDING_PER_TENANT", 4)),
+            max_queue=int(os.getenv("STAGE_MAX_QUEUE", 8)),
+            tenant_weights=weights,
+        )
+
+    def weight(self, tenant: str) -> float:
+        return self.tenant_weights.get(tenant, 1.0)
+
+    def charge(self, tenant: str, audio_seconds: float):
+        """
+        Debita a duração do áudio do balde do cliente
+
+        Raises:
+            QuotaExceeded: se o cliente não tiver saldo de segundos de áudio
+        """
+        if not self.enabled:
+            return
+
+        now = time.monotonic()
+        if now - self._pruned_at >= self.PRUNE_INTERVAL:
+            self._prune_buckets(now)
+
+        bucket = self._buckets.get(tenant)
+        if bucket is None:
+            capacity = self.burst_seconds * self.weight(tenant)
+            bucket = self._buckets[tenant] = TokenBucket(capacity, self.rate * self.weight(tenant))
+
+        retry_after = bucket.try_consume(audio_seconds, now)
+        if retry_after:
+            raise QuotaExceeded(
+                f"Cota de áudio excedida: {audio_seconds:.1f}s solicitados, "
+                f"saldo de {max(bucket.tokens, 0):.1f}s",
+                retry_after=retry_after,
+            )
+
+    def _prune_buckets(self, now: float):
+        """Remove os baldes que já encheram: o cliente recomeça com um balde novo"""
+        full = [tenant for tenant, bucket in self._buckets.items() if bucket.is_full(now)]
+        for tenant in full:
+            del self._buckets[tenant]
+        self._pruned_at = now
+
+    def refund(self, tenant: str, audio_seconds: float):
+        """Devolve segundos cobrados de uma requisição que não foi executada"""
+        bucket = self._buckets.get(tenant)
+        if bucket is not None:
+            bucket.tokens = min(bucket.capacity, bucket.tokens + audio_seconds)
+
+    def admit(self, tenant: str, audio_seconds: float) -> "_Admission":
+        """
+        Cobra o áudio e reserva um slot de inferência
+
+        Uso: `async with admission.admit(cliente, duracao): ...`
+        """
+        return _Admission(self, tenant, audio_seconds)
+
+    def slot(self, tenant: str, audio_seconds: float) -> "_Admission":
+        """
+        Reserva apenas o slot de inferência (o áudio já foi cobrado com `charge`
+        e é devolvido se a fila recusar a requisição)
+
+        Uso: `async with admission.slot(cliente, duracao): ...`
+        """
+        return _Admission(self, tenant, audio_seconds, charge=False)
+
+    def snapshot(self) -> dict:
+        """Estado atual para health check e diagnóstico"""
+        return {
+            "enabled": self.enabled,
+            "inference_slots": self.scheduler.slots,
+            "inference_in_use": self.scheduler.in_use,
+            "queue_depth": self.scheduler.queue_depth(),
+            "max_queue": self.scheduler.max_queue,
+            "tenants": len(self._buckets),
+        }
+
+
+class _Admission:
+    def __init__(self, controller: AdmissionController, tenant: str, audio_seconds: float,
+                 charge: bool = True):
+        self.controller = controller
+        self.tenant = tenant
+        self.audio_seconds = audio_seconds
+        self.charge = charge
+
+    async def __aenter__(self):
+        if self.charge:
+            self.controller.charge(self.tenant, self.audio_seconds)
+        try:
+            await self.controller.scheduler.acquire(
+                self.tenant, self.audio_seconds, self.controller.weight(self.tenant)
+            )
+        except (QuotaExceeded, StageBusy, asyncio.CancelledError):
+            self.controller.refund(self.tenant, self.audio_seconds)
+            raise
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.controller.scheduler.release()
+        return False
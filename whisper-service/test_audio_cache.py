@@ -0,0 +1,87 @@
+"""
+Testes do cache de áudio decodificado (audio_cache.py)
+Execute: python -m pytest test_audio_cache.py
+"""
+
+import numpy as np
+
+from audio_cache import AudioCache, audio_id_for, vad_key
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def pcm(seconds: float) -> np.ndarray:
+    # float32 16 kHz: 64000 bytes por segundo
+    return np.zeros(int(seconds * 16000), dtype=np.float32)
+
+
+def test_entries_are_isolated_per_tenant():
+    cache = AudioCache(clock=FakeClock())
+    cache.put("clinica-a", "id", pcm(1))
+
+    assert cache.get("clinica-a", "id") is not None
+    assert cache.get("clinica-b", "id") is None
+
+
+def test_least_recently_used_is_evicted_by_size():
+    cache = AudioCache(max_bytes=3 * 64000, clock=FakeClock())
+    cache.put("a", "1", pcm(1))
+    cache.put("a", "2", pcm(1))
+    cache.put("a", "3", pcm(1))
+    cache.get("a", "1")  # "2" passa a ser o menos usado
+
+    cache.put("a", "4", pcm(1))
+
+    assert cache.get("a", "2") is None
+    assert all(cache.get("a", key) is not None for key in ("1", "3", "4"))
+    assert cache.total_bytes == 3 * 64000
+
+
+def test_audio_larger_than_cache_is_not_stored():
+    cache = AudioCache(max_bytes=64000, clock=FakeClock())
+    assert cache.put("a", "grande", pcm(2)) is None
+    assert cache.total_bytes == 0
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = AudioCache(ttl_seconds=900, clock=clock)
+    cache.put("a", "1", pcm(1))
+
+    clock.now = 900
+    assert cache.get("a", "1") is not None
+
+    clock.now = 901
+    assert cache.get("a", "1") is None
+    assert cache.total_bytes == 0
+    assert cache.snapshot()["entries"] == 0
+
+
+def test_put_again_keeps_speech_chunks():
+    cache = AudioCache(clock=FakeClock())
+    entry = cache.put("a", "1", pcm(1))
+    entry.speech_chunks[vad_key({"min_silence_duration_ms": 500})] = [{"start": 0, "end": 8000}]
+
+    entry = cache.put("a", "1", pcm(1))
+
+    assert entry.speech_chunks == {vad_key({"min_silence_duration_ms": 500}): [{"start": 0, "end": 8000}]}
+    assert cache.total_bytes == 64000
+
+
+def test_disabled_cache_stores_nothing():
+    cache = AudioCache(enabled=False, clock=FakeClock())
+    assert cache.put("a", "1", pcm(1)) is None
+    assert cache.get("a", "1") is None
+
+
+def test_ids_and_vad_keys_are_stable():
+    assert audio_id_for(b"audio") == audio_id_for(b"audio")
+    assert audio_id_for(b"audio") != audio_id_for(b"outro")
+    assert vad_key({"a": 1, "b": 2}) == vad_key({"b": 2, "a": 1})
+    assert vad_key(None) == vad_key({})
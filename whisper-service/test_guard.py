@@ -0,0 +1,108 @@
+"""
+Testes da guarda contra alucinação (guard.py)
+Execute: python -m pytest test_guard.py
+"""
+
+from engines import Segment
+from guard import ABORT, KEEP, SKIP, GuardConfig, HallucinationGuard
+
+
+def segments(texts, avg_logprob=-0.2, no_speech_prob=0.05):
+    return [
+        Segment(start=i * 2.0, end=i * 2.0 + 2.0, text=" " + text,
+                avg_logprob=avg_logprob, no_speech_prob=no_speech_prob)
+        for i, text in enumerate(texts)
+    ]
+
+
+def actions(guard, items):
+    return [guard.check(segment) for segment in items]
+
+
+def test_confident_prescriptions_are_kept():
+    guard = HallucinationGuard(GuardConfig())
+    items = segments([
+        "Amoxicilina 500 mg de 8 em 8 horas.",
+        "Dipirona 500 mg de 6 em 6 horas.",
+        "Ibuprofeno 600 mg de 8 em 8 horas.",
+        "Cefalexina 500 mg de 8 em 8 horas.",
+    ])
+
+    assert actions(guard, items) == [KEEP] * 4
+    assert guard.flags == []
+
+
+def test_repetition_only_in_kept_speech_does_not_condemn_next_segment():
+    guard = HallucinationGuard(GuardConfig())
+    prescriptions = segments([
+        "Amoxicilina 500 mg de 8 em 8 horas.",
+        "Dipirona 500 mg de 8 em 8 horas.",
+        "Ibuprofeno 600 mg de 8 em 8 horas.",
+        "Cefalexina 500 mg de 8 em 8 horas.",
+    ])
+    unsure = segments(["Paciente refere dor abdominal intensa."], avg_logprob=-1.1)
+
+    assert actions(guard, prescriptions + unsure) == [KEEP] * 5
+    assert [flag["reason"] for flag in guard.flags] == ["low_logprob"]
+
+
+def test_confident_repeated_answer_is_kept():
+    guard = HallucinationGuard(GuardConfig())
+    assert actions(guard, segments(["Sim.", "Sim."])) == [KEEP, KEEP]
+
+
+def test_low_logprob_is_flagged_but_never_aborts():
+    guard = HallucinationGuard(GuardConfig())
+    items = segments(["paciente refere dor", "há três dias", "sem febre", "exame normal"],
+                     avg_logprob=-1.5)
+
+    assert actions(guard, items) == [KEEP] * 4
+    assert not guard.aborted
+    assert [flag["reason"] for flag in guard.flags] == ["low_logprob"] * 4
+
+
+def test_uncertain_repetition_loop_is_skipped_then_aborted():
+    guard = HallucinationGuard(GuardConfig())
+    items = segments(["Obrigado."] * 5, avg_logprob=-1.2, no_speech_prob=0.3)
+
+    # O primeiro só tem log-prob baixa; as repetições são descartadas
+    assert actions(guard, items) == [KEEP, SKIP, SKIP, ABORT, SKIP]
+    assert guard.aborted
+    assert guard.report()["skipped_segments"] == 4
+
+
+def test_silence_and_compression_are_skipped():
+    guard = HallucinationGuard(GuardConfig())
+    silence = segments(["Legendas pela comunidade."], avg_logprob=-1.3, no_speech_prob=0.9)
+    loop = segments(["e então e então " * 10])
+
+    assert actions(guard, silence + loop) == [SKIP, SKIP]
+    assert [flag["reason"] for flag in guard.flags] == ["no_speech", "compression_ratio"]
+
+
+def test_kept_speech_resets_bad_sequence():
+    guard = HallucinationGuard(GuardConfig(max_consecutive_bad=2))
+    bad = segments(["Legendas pela comunidade."], avg_logprob=-1.3, no_speech_prob=0.9)[0]
+    good = segments(["Pressão arterial controlada."])[0]
+
+    assert actions(guard, [bad, good, bad, good]) == [SKIP, KEEP, SKIP, KEEP]
+    assert not guard.aborted
+
+
+def test_resume_budget_skips_ahead_then_stops():
+    guard = HallucinationGuard(GuardConfig(skip_seconds=30, max_resumes=2))
+
+    assert guard.resume_at(10.0) == 40.0
+    assert guard.resume_at(50.0) == 80.0
+    assert guard.resume_at(90.0) is None
+    assert guard.report()["resumes"] == 2
+    assert guard.report()["stopped"]
+
+
+def test_flags_are_capped():
+    guard = HallucinationGuard(GuardConfig(max_flags=3))
+    actions(guard, segments([f"trecho incerto {i}" for i in range(5)], avg_logprob=-1.5))
+
+    report = guard.report()
+    assert len(report["flags"]) == 3
+    assert report["flags_dropped"] == 2
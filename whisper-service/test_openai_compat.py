@@ -0,0 +1,90 @@
+"""
+Testes da compatibilidade com a API de transcrição da OpenAI (openai_compat.py)
+Execute: python -m pytest test_openai_compat.py
+"""
+
+import json
+
+from openai_compat import error_response, format_timestamp, render, to_srt, to_vtt, verbose_json
+
+SEGMENTS = [
+    {
+        "id": 0, "start": 0.0, "end": 2.5, "text": "Paciente refere dor.",
+        "words": [
+            {"word": "Paciente", "start": 0.0, "end": 0.8},
+            {"word": "refere", "start": 0.8, "end": 1.4},
+            {"word": "dor.", "start": 1.4, "end": 2.5},
+        ],
+    },
+    {"id": 1, "start": 3661.25, "end": 3663.0, "text": "Há três dias.", "words": None},
+]
+
+
+def test_format_timestamp():
+    assert format_timestamp(0) == "00:00:00,000"
+    assert format_timestamp(3661.25) == "01:01:01,250"
+    assert format_timestamp(59.9996, ".") == "00:01:00.000"
+    assert format_timestamp(-1) == "00:00:00,000"
+
+
+def test_srt():
+    assert to_srt(SEGMENTS) == (
+        "1\n00:00:00,000 --> 00:00:02,500\nPaciente refere dor.\n"
+        "\n"
+        "2\n01:01:01,250 --> 01:01:03,000\nHá três dias.\n"
+    )
+
+
+def test_vtt():
+    assert to_vtt(SEGMENTS) == (
+        "WEBVTT\n"
+        "\n"
+        "00:00:00.000 --> 00:00:02.500\nPaciente refere dor.\n"
+        "\n"
+        "01:01:01.250 --> 01:01:03.000\nHá três dias.\n"
+    )
+
+
+def test_verbose_json_defaults_to_segments():
+    body = verbose_json("texto", SEGMENTS, "pt", 3663.0, [])
+
+    assert body["task"] == "transcribe"
+    assert body["language"] == "portuguese"
+    assert "words" not in body
+    assert [segment["id"] for segment in body["segments"]] == [0, 1]
+    assert all("words" not in segment for segment in body["segments"])
+
+
+def test_verbose_json_word_granularity_only():
+    body = verbose_json("texto", SEGMENTS, "pt", 3663.0, ["word"])
+
+    assert "segments" not in body
+    assert [word["word"] for word in body["words"]] == ["Paciente", "refere", "dor."]
+
+
+def test_verbose_json_both_granularities():
+    body = verbose_json("texto", SEGMENTS, "xx", 3663.0, ["word", "segment"])
+
+    assert len(body["words"]) == 3
+    assert len(body["segments"]) == 2
+    assert body["language"] == "xx"
+
+
+def test_render_formats():
+    assert render("text", "texto", SEGMENTS, "pt", 1.0, []).body == "texto\n".encode()
+    assert json.loads(render("json", "texto", SEGMENTS, "pt", 1.0, []).body) == {"text": "texto"}
+    assert render("srt", "texto", SEGMENTS, "pt", 1.0, []).body.decode() == to_srt(SEGMENTS)
+    assert render("vtt", "texto", SEGMENTS, "pt", 1.0, []).body.decode() == to_vtt(SEGMENTS)
+
+
+def test_error_shape():
+    response = error_response(429, "Cota excedida", headers={"Retry-After": "5"})
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "5"
+    assert json.loads(response.body) == {
+        "error": {"message": "Cota excedida", "type": "rate_limit_exceeded", "param": None, "code": None}
+    }
+    error = json.loads(error_response(400, "inválido", param="response_format").body)["error"]
+    assert error["type"] == "invalid_request_error"
+    assert error["param"] == "response_format"
@@ -0,0 +1,143 @@
+"""
+Testes do controle de admissão (quota.py)
+Execute: python -m pytest test_quota.py
+"""
+
+import asyncio
+
+import pytest
+
+from pipeline import StageBusy
+from quota import AdmissionController, FairScheduler, QuotaExceeded, TokenBucket
+
+
+def test_bucket_refills_up_to_capacity():
+    bucket = TokenBucket(capacity=60, rate=1)
+    bucket.updated_at = 0.0
+
+    assert bucket.try_consume(50, now=0.0) == 0.0
+    assert bucket.try_consume(20, now=0.0) == pytest.approx(10.0)
+    assert bucket.try_consume(20, now=10.0) == 0.0
+
+    bucket._refill(1000.0)
+    assert bucket.tokens == 60
+
+
+def test_bucket_accepts_long_audio_when_full_and_goes_into_debt():
+    bucket = TokenBucket(capacity=60, rate=1)
+    bucket.updated_at = 0.0
+
+    assert bucket.try_consume(100, now=0.0) == 0.0
+    assert bucket.tokens == -40
+    # Só volta a aceitar quando a dívida for paga
+    assert bucket.try_consume(10, now=0.0) == pytest.approx(50.0)
+
+
+def test_full_buckets_are_pruned():
+    admission = AdmissionController(audio_seconds_per_minute=60, burst_seconds=60)
+    admission.charge("clinica-a", 30)
+    admission.charge("clinica-b", 1)
+
+    now = admission._buckets["clinica-a"].updated_at
+    admission._prune_buckets(now + 5)
+    assert set(admission._buckets) == {"clinica-a"}
+
+    admission._prune_buckets(now + 30)
+    assert admission._buckets == {}
+
+
+def test_charge_raises_with_retry_after():
+    admission = AdmissionController(audio_seconds_per_minute=60, burst_seconds=60)
+    admission.charge("clinica-a", 60)
+
+    with pytest.raises(QuotaExceeded) as error:
+        admission.charge("clinica-a", 30)
+    assert error.value.retry_after > 0
+
+    # Outro cliente não é afetado
+    admission.charge("clinica-b", 60)
+
+
+def test_fair_queue_interleaves_tenants():
+    async def scenario():
+        scheduler = FairScheduler(slots=1, max_pending_per_tenant=10)
+        order = []
+
+        async def request(tenant, cost):
+            await scheduler.acquire(tenant, cost)
+            order.append(tenant)
+            await asyncio.sleep(0)
+            scheduler.release()
+
+        await scheduler.acquire("bloqueio", 1)
+        tasks = [asyncio.create_task(request("bulk", 100)) for _ in range(3)]
+        tasks.append(asyncio.create_task(request("pequena", 10)))
+        await asyncio.sleep(0)
+        scheduler.release()
+        await asyncio.gather(*tasks)
+        return order, scheduler
+
+    order, scheduler = asyncio.run(scenario())
+    # A clínica com upload pequeno não espera todos os uploads grandes da outra
+    assert order.index("pequena") < 2
+    # Ocioso: nenhuma etiqueta de término fica guardada
+    assert scheduler._finish_tags == {}
+    assert scheduler.in_use == 0
+
+
+def test_fair_queue_rejects_when_tenant_queue_is_full():
+    async def scenario():
+        scheduler = FairScheduler(slots=1, max_pending_per_tenant=1)
+        await scheduler.acquire("a", 1)
+        waiting = asyncio.create_task(scheduler.acquire("a", 1))
+        await asyncio.sleep(0)
+        with pytest.raises(QuotaExceeded) as error:
+            await scheduler.acquire("a", 1800)
+        # Upload longo não recebe um Retry-After proporcional à duração
+        assert error.value.retry_after == FairScheduler.QUEUE_RETRY_AFTER
+        scheduler.release()
+        await waiting
+        scheduler.release()
+
+    asyncio.run(scenario())
+
+
+def test_fair_queue_has_global_limit():
+    async def scenario():
+        scheduler = FairScheduler(slots=1, max_pending_per_tenant=4, max_queue=2)
+        await scheduler.acquire("a", 1)
+        waiting = [asyncio.create_task(scheduler.acquire(f"ip:{i}", 1)) for i in range(2)]
+        await asyncio.sleep(0)
+        assert scheduler.waiting() == 2
+
+        # Cada cliente novo cabe no próprio limite, mas a fila total está cheia
+        with pytest.raises(StageBusy):
+            await scheduler.acquire("ip:3", 1)
+
+        for task in waiting:
+            scheduler.release()
+            await task
+        scheduler.release()
+        assert scheduler.waiting() == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_request_does_not_hold_slot():
+    async def scenario():
+        scheduler = FairScheduler(slots=1)
+        await scheduler.acquire("a", 1)
+        cancelled = asyncio.create_task(scheduler.acquire("b", 1))
+        waiting = asyncio.create_task(scheduler.acquire("c", 5))
+        await asyncio.sleep(0)
+
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        scheduler.release()
+        await waiting
+        assert scheduler.in_use == 1
+        scheduler.release()
+        assert scheduler.in_use == 0
+        assert scheduler.queue_depth() == 0
+
+    asyncio.run(scenario())